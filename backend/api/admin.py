@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Property, RealEstateAgent
+from .models import Place, Property, RealEstateAgent
 
 admin.site.register(RealEstateAgent)
 
@@ -16,3 +16,10 @@ class PropertyAdmin(admin.ModelAdmin):
         "bathrooms",
         "cordinates",
     )
+
+
+@admin.register(Place)
+class PlaceAdmin(admin.ModelAdmin):
+    list_display = ("name", "normalized_name")
+    search_fields = ("normalized_name",)
+    exclude = ("polygon", "simplified_polygon")
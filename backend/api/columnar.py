@@ -0,0 +1,54 @@
+import struct
+
+from django.conf import settings
+
+from .models import Property
+from .spatial import latitude, longitude
+
+COLUMNS = ("id", "lon", "lat", "price", "bedrooms", "sale_type")
+# struct format of each column in packed buffers, coordinates are float32,
+# about a metre of precision
+PACKED_TYPES = ("i", "f", "f", "i", "i", "i")
+# Packed sale types are indexes into this list
+SALE_TYPES = Property.SaleTypes.values
+
+
+def select_rows(queryset, ordering):
+    """
+    Up to COLUMNAR_MAX_ROWS tuples of COLUMNS in one query and whether more
+    properties matched
+    """
+    if not queryset.ordered:
+        queryset = queryset.order_by(*ordering)
+    limit = settings.COLUMNAR_MAX_ROWS
+    rows = list(
+        queryset.values_list(
+            "id", longitude(), latitude(), "price", "bedrooms", "sale_type"
+        )[: limit + 1]
+    )
+    return rows[:limit], len(rows) > limit
+
+
+def to_columns(rows, truncated):
+    """{"count", "truncated", column: [values]} for JSON"""
+    columns = zip(*rows) if rows else [()] * len(COLUMNS)
+    return {
+        "count": len(rows),
+        "truncated": truncated,
+        **{name: list(values) for name, values in zip(COLUMNS, columns)},
+    }
+
+
+def pack(rows, truncated):
+    """
+    Little endian uint32 row count and uint32 truncated flag, then every
+    column of COLUMNS as count int32 or float32 values
+    """
+    count = len(rows)
+    columns = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+    sale_types = {sale_type: index for index, sale_type in enumerate(SALE_TYPES)}
+    columns[-1] = [sale_types[sale_type] for sale_type in columns[-1]]
+    return struct.pack("<II", count, truncated) + b"".join(
+        struct.pack(f"<{count}{code}", *values)
+        for code, values in zip(PACKED_TYPES, columns)
+    )
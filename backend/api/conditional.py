@@ -0,0 +1,65 @@
+import hashlib
+from calendar import timegm
+
+from django.conf import settings
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+from . import search_cache
+from .filters import PROPERTY_MAX_AGE
+
+
+def make_etag(request, *version):
+    """ETag of the response to request while its data is at version"""
+    key = "\n".join(
+        [request.get_full_path(), request.accepted_renderer.format, *map(str, version)]
+    )
+    return quote_etag(hashlib.sha1(key.encode()).hexdigest())
+
+
+def search_validators(request, geotext=None):
+    """
+    (ETag, generation) of a search without running it, (None, None) when
+    Redis is down. Address searches use the generation of the area, other
+    searches the generation of all properties. A days_old window moves
+    without either changing, the hour is part of the ETag as well.
+    """
+    if geotext:
+        generation = search_cache.cache.get_version(geotext)
+    else:
+        generation = search_cache.cache.get_changes_version()
+    if generation is None:
+        return None, None
+    window = PROPERTY_MAX_AGE.get_version(request.query_params)
+    return make_etag(request, generation, window), generation
+
+
+def not_modified(request, etag, last_modified=None):
+    """304 or 412 response when the client's copy is current, otherwise None"""
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified and timegm(last_modified.utctimetuple()),
+    )
+
+
+def add_validators(response, etag, last_modified=None, public=True):
+    """
+    Browsers revalidate on every use, shared caches such as a CDN can answer
+    for HTTP_CACHE_MAX_AGE seconds unless the response isn't public
+    """
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(timegm(last_modified.utctimetuple()))
+    if public:
+        patch_cache_control(
+            response, public=True, max_age=0, s_maxage=settings.HTTP_CACHE_MAX_AGE
+        )
+    else:
+        patch_cache_control(response, private=True, max_age=0)
+    patch_vary_headers(response, ["Accept"])
+    return response
@@ -0,0 +1,159 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class ExactFilter:
+    def __init__(self, field, param=None):
+        self.field = field
+        self.param = param or field
+        self.params = (self.param,)
+
+    def filter(self, queryset, params):
+        if value := params.get(self.param):
+            return queryset.filter(**{self.field: value})
+        return queryset
+
+
+class RangeFilter:
+    """Inclusive range read from <param>_min and <param>_max integers"""
+
+    def __init__(self, field, param=None):
+        self.field = field
+        self.param = param or field
+        self.params = (f"{self.param}_min", f"{self.param}_max")
+
+    def parse(self, params, suffix):
+        param = f"{self.param}_{suffix}"
+        value = params.get(param)
+        if not value:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({param: ["A valid integer is required."]})
+
+    def filter(self, queryset, params):
+        lookups = {}
+        if (minimum := self.parse(params, "min")) is not None:
+            lookups[f"{self.field}__gte"] = minimum
+        if (maximum := self.parse(params, "max")) is not None:
+            lookups[f"{self.field}__lte"] = maximum
+        return queryset.filter(**lookups) if lookups else queryset
+
+
+class MaxAgeFilter:
+    """Rows newer than one of the choices, e.g. {"7d": timedelta(days=7)}"""
+
+    def __init__(self, field, param, choices):
+        self.field = field
+        self.param = param
+        self.params = (param,)
+        self.choices = choices
+
+    def get_age(self, params):
+        value = params.get(self.param)
+        if not value:
+            return None
+        if value not in self.choices:
+            raise ValidationError(
+                {self.param: [f"Choose one of {', '.join(self.choices)}."]}
+            )
+        return self.choices[value]
+
+    def get_version(self, params):
+        """
+        The current hour when filtering by age, otherwise None. Matches leave
+        the window without a generation change, so cached pages and ETags are
+        versioned by the hour too.
+        """
+        if self.get_age(params) is None:
+            return None
+        return timezone.now().replace(minute=0, second=0, microsecond=0)
+
+    def filter(self, queryset, params):
+        if (age := self.get_age(params)) is None:
+            return queryset
+        return queryset.filter(**{f"{self.field}__gt": timezone.now() - age})
+
+
+class TextSearchFilter:
+    """
+    Full-text match of a web search style query, e.g. garden -flat "double
+    garage", against a SearchVectorField. sort=relevance orders matches by rank.
+    """
+
+    def __init__(self, field, param="q", config="english"):
+        self.field = field
+        self.param = param
+        # The ranking changes the order of results as well
+        self.params = (param, "sort")
+        self.config = config
+
+    def get_query(self, params):
+        if value := params.get(self.param, "").strip():
+            return SearchQuery(value, config=self.config, search_type="websearch")
+        return None
+
+    def filter(self, queryset, params):
+        if (query := self.get_query(params)) is None:
+            return queryset
+        return queryset.filter(**{self.field: query})
+
+    def order_by_rank(self, queryset, params):
+        """Best matches first when sorting by relevance"""
+        if params.get("sort") != "relevance":
+            return queryset
+        if (query := self.get_query(params)) is None:
+            raise ValidationError({"sort": [f"Relevance requires {self.param}."]})
+        # ts_rank is a real, as a double it survives the round trip through
+        # a pagination cursor exactly
+        rank = Cast(SearchRank(F(self.field), query), FloatField())
+        return queryset.annotate(rank=rank).order_by("-rank", "-id")
+
+
+PROPERTY_SEARCH = TextSearchFilter("search_vector")
+PROPERTY_MAX_AGE = MaxAgeFilter(
+    "date",
+    "days_old",
+    {f"{days}d": timezone.timedelta(days=days) for days in (1, 3, 7, 14, 30)},
+)
+
+PROPERTY_FILTERS = (
+    ExactFilter("sale_type"),
+    ExactFilter("property_type"),
+    RangeFilter("price"),
+    RangeFilter("bedrooms"),
+    RangeFilter("bathrooms"),
+    PROPERTY_MAX_AGE,
+    PROPERTY_SEARCH,
+)
+
+
+def filter_properties(queryset, params, filters=PROPERTY_FILTERS):
+    for spec in filters:
+        queryset = spec.filter(queryset, params)
+    return queryset
+
+
+def filters_key(params, filters=PROPERTY_FILTERS):
+    """Digest of the filter params in use, other params don't change results"""
+    used = sorted(
+        (name, params[name])
+        for spec in filters
+        for name in spec.params
+        if params.get(name)
+    )
+    return hashlib.sha1(urlencode(used).encode()).hexdigest()
+
+
+class PropertyFilterBackend(BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        filters = getattr(view, "property_filters", PROPERTY_FILTERS)
+        return filter_properties(queryset, request.query_params, filters)
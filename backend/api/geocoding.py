@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import re
+import time
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Q
+from redis import RedisError
+from rest_framework.exceptions import APIException
+
+from backend import metrics
+from backend.outbound import get_session, record_latency
+from helpers import LRUCache, database_sync_to_async, get_redis
+
+from .models import Place
+
+# Cached in place of a polygon for addresses that didn't resolve to one
+NOT_FOUND = ""
+
+
+class GeocodingUnavailable(APIException):
+    status_code = 503
+    default_detail = "Geocoding service is unavailable, try again later."
+    default_code = "geocoding_unavailable"
+
+
+def normalize_address(address):
+    return " ".join(re.sub(r"[^\w]+", " ", address.casefold()).split())
+
+
+class GeocodingCache:
+    """
+    Two tier cache of resolved polygons: an in-process LRU in front of Redis.
+    Addresses without a polygon are cached as NOT_FOUND for a shorter time.
+    """
+
+    key_prefix = "geocode:"
+
+    def __init__(self):
+        self.local = LRUCache(
+            maxsize=settings.GEOCODING_CACHE_MAXSIZE,
+            ttl=settings.GEOCODING_CACHE_TTL,
+        )
+
+    def make_key(self, address):
+        digest = hashlib.sha1(normalize_address(address).encode()).hexdigest()
+        return self.key_prefix + digest
+
+    def get_ttl(self, geotext):
+        if geotext == NOT_FOUND:
+            return settings.GEOCODING_CACHE_NEGATIVE_TTL
+        return settings.GEOCODING_CACHE_TTL
+
+    def get(self, address):
+        key = self.make_key(address)
+        geotext = self.local.get(key)
+        if geotext is None:
+            try:
+                stored = get_redis().get(key)
+            except RedisError:
+                stored = None
+            if stored is not None:
+                geotext = stored.decode()
+                self.local.set(key, geotext, self.get_ttl(geotext))
+
+        metrics.incr("geocoding.hits" if geotext is not None else "geocoding.misses")
+        return geotext
+
+    def set(self, address, geotext):
+        key = self.make_key(address)
+        ttl = self.get_ttl(geotext)
+        self.local.set(key, geotext, ttl)
+        try:
+            get_redis().setex(key, ttl, geotext)
+        except RedisError:
+            pass
+
+    def delete(self, address):
+        key = self.make_key(address)
+        self.local.delete(key)
+        try:
+            get_redis().delete(key)
+        except RedisError:
+            pass
+
+
+cache = GeocodingCache()
+
+
+def get_search_params(address):
+    return {
+        "q": address,
+        "format": "json",
+        "country": "United Kingdom",
+        "polygon_text": 1,
+        "limit": 3,
+    }
+
+
+def pick_polygon(results):
+    if not isinstance(results, list):
+        raise GeocodingUnavailable()
+    for place in results:
+        geotext = place.get("geotext", "") if isinstance(place, dict) else ""
+        if not isinstance(geotext, str):
+            continue
+        if "POLYGON" in geotext:
+            return geotext
+    return NOT_FOUND
+
+
+def fetch_polygon(address):
+    metrics.incr("geocoding.upstream_requests")
+    try:
+        response = get_session("nominatim").get(
+            settings.NOMINATIM_URL, params=get_search_params(address)
+        )
+        response.raise_for_status()
+        results = response.json()
+    except (requests.RequestException, ValueError):
+        raise GeocodingUnavailable()
+    return pick_polygon(results)
+
+
+class AsyncGeocoder:
+    """
+    Pooled HTTP client for geocoding from async views. At most
+    GEOCODING_MAX_CONCURRENCY lookups are sent upstream at once, the rest wait.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.client = None
+
+    async def setup(self):
+        # Clients and semaphores can't be shared between event loops
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            if self.client is not None:
+                try:
+                    await self.client.aclose()
+                except RuntimeError:
+                    # Connections of a closed loop are already gone
+                    pass
+            self.client = httpx.AsyncClient(
+                timeout=settings.GEOCODING_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=settings.GEOCODING_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.GEOCODING_MAX_CONNECTIONS,
+                ),
+            )
+            self.semaphore = asyncio.Semaphore(settings.GEOCODING_MAX_CONCURRENCY)
+
+    async def fetch_polygon(self, address):
+        """Same as fetch_polygon, upstream errors are GeocodingUnavailable"""
+        await self.setup()
+        async with self.semaphore:
+            metrics.incr("geocoding.upstream_requests")
+            start = time.perf_counter()
+            try:
+                response = await self.client.get(
+                    settings.NOMINATIM_URL, params=get_search_params(address)
+                )
+                response.raise_for_status()
+                results = response.json()
+            except (httpx.HTTPError, ValueError):
+                raise GeocodingUnavailable()
+            finally:
+                record_latency(settings.NOMINATIM_URL, time.perf_counter() - start)
+        return pick_polygon(results)
+
+
+async_geocoder = AsyncGeocoder()
+
+
+def lookup_place(address):
+    """Resolve address against the local gazetteer, preferring the closest name"""
+    name = normalize_address(address)
+    if not name:
+        return None
+    is_prefix = Q(normalized_name__startswith=name)
+    polygon = (
+        Place.objects.filter(is_prefix | Q(normalized_name__trigram_similar=name))
+        .annotate(similarity=TrigramSimilarity("normalized_name", name))
+        .filter(is_prefix | Q(similarity__gte=settings.GAZETTEER_MIN_SIMILARITY))
+        .order_by("-similarity")
+        .values_list("simplified_polygon", flat=True)
+        .first()
+    )
+    metrics.incr("gazetteer.hits" if polygon else "gazetteer.misses")
+    return polygon.wkt if polygon else None
+
+
+def geocode(address):
+    """Return WKT polygon of address or None if it can't be resolved to an area"""
+    if geotext := lookup_place(address):
+        return geotext
+
+    geotext = cache.get(address)
+    if geotext is None:
+        geotext = fetch_polygon(address)
+        cache.set(address, geotext)
+    return geotext or None
+
+
+async def geocode_async(address):
+    if geotext := await database_sync_to_async(lookup_place)(address):
+        return geotext
+
+    geotext = await sync_to_async(cache.get, thread_sensitive=False)(address)
+    if geotext is None:
+        geotext = await async_geocoder.fetch_polygon(address)
+        await sync_to_async(cache.set, thread_sensitive=False)(address, geotext)
+    return geotext or None
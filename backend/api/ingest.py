@@ -0,0 +1,220 @@
+import csv
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework import serializers
+
+from .models import Property
+from .serializers import PropertySerializer
+from .signals import invalidate_caches
+from .tasks import classify_properties
+
+FORMATS = ("ndjson", "csv")
+# Columns holding JSON documents in CSV feeds
+CSV_JSON_FIELDS = ("key_features",)
+MAX_REPORTED_ERRORS = 100
+
+
+def thumbnail_prefix(agent):
+    """Media storage folder for the images an agency references in feeds"""
+    return f"agencies/{agent.pk}/"
+
+
+class PropertyImportSerializer(PropertySerializer):
+    """
+    PropertySerializer rules for feed rows, thumbnail is the name of an image
+    already uploaded to the agency's folder in media storage
+    """
+
+    thumbnail = serializers.CharField(max_length=100)
+    thumbnail_srcset = None
+
+    class Meta(PropertySerializer.Meta):
+        fields = [
+            field
+            for field in PropertySerializer.Meta.fields
+            if field not in ("id", "thumbnail_srcset", "status")
+        ] + ["external_id"]
+        read_only_fields = []
+        extra_kwargs = {
+            "external_id": {
+                "required": True,
+                "allow_null": False,
+                "allow_blank": False,
+            }
+        }
+
+    def validate_thumbnail(self, value):
+        prefix = thumbnail_prefix(self.context["agent"])
+        if not value.startswith(prefix) or ".." in value.split("/"):
+            raise serializers.ValidationError(f"Thumbnail must be under {prefix}.")
+        return value
+
+
+def list_files(storage, path):
+    """Names of every file under path, one listing per folder"""
+    folders, files = storage.listdir(path)
+    names = {path + name for name in files}
+    for folder in folders:
+        names |= list_files(storage, f"{path}{folder}/")
+    return names
+
+
+def read_ndjson(lines):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+def read_csv(lines):
+    reader = csv.DictReader(lines)
+    for row in reader:
+        for field in CSV_JSON_FIELDS:
+            if field in row:
+                try:
+                    row[field] = json.loads(row[field]) if row[field] else None
+                except ValueError:
+                    pass
+        yield reader.line_num, row
+
+
+READERS = {"ndjson": read_ndjson, "csv": read_csv}
+
+
+class PropertyImport:
+    """
+    Validate feed rows and upsert them on (agent, external_id) in chunks of
+    batch_size, one transaction and a couple of queries per chunk
+    """
+
+    update_fields = [
+        field
+        for field in PropertyImportSerializer.Meta.fields
+        if field != "external_id"
+    ] + ["status", "thumbnail_variants", "modified"]
+
+    def __init__(self, agent, batch_size=None):
+        self.agent = agent
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        # Bound fields are reused for every row, binding them per row is slow
+        self.serializer = PropertyImportSerializer(context={"agent": agent})
+        self.created = self.updated = self.invalid = 0
+        self.errors = []
+
+    def run(self, rows):
+        """Import (line number, row) pairs, e.g. from read_ndjson"""
+        batch = {}
+        for number, row in rows:
+            if (data := self.validate(number, row)) is None:
+                continue
+            batch[data.pop("external_id")] = data
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                batch = {}
+        if batch:
+            self.write(batch)
+        return self.result
+
+    @property
+    def result(self):
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "invalid": self.invalid,
+            "errors": self.errors,
+        }
+
+    def validate(self, number, row):
+        if not isinstance(row, dict):
+            return self.add_error(number, {"non_field_errors": ["Invalid row."]})
+        try:
+            data = dict(self.serializer.run_validation(row))
+        except serializers.ValidationError as e:
+            return self.add_error(number, e.detail)
+        if data["thumbnail"] not in self.thumbnails:
+            return self.add_error(number, {"thumbnail": ["Thumbnail doesn't exist."]})
+        return data
+
+    @cached_property
+    def thumbnails(self):
+        """
+        Images uploaded for the agency, listed once per import instead of an
+        existence check per row, each of which is a request to S3
+        """
+        storage = Property.thumbnail.field.storage
+        return list_files(storage, thumbnail_prefix(self.agent))
+
+    def add_error(self, number, detail):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": number, "errors": detail})
+
+    @transaction.atomic
+    def write(self, batch):
+        existing = {
+            property.external_id: property
+            for property in Property.objects.select_for_update()
+            .filter(agent=self.agent, external_id__in=batch)
+            .only(
+                "id",
+                "external_id",
+                "thumbnail",
+                "status",
+                "thumbnail_variants",
+                "cordinates",
+            )
+        }
+        created, updated, review, moved = [], [], [], []
+        # bulk_update doesn't set auto_now fields
+        now = timezone.now()
+        for external_id, data in batch.items():
+            property = existing.get(external_id)
+            if property is None:
+                property = Property(
+                    agent=self.agent,
+                    external_id=external_id,
+                    status=Property.Status.PENDING_REVIEW,
+                    **data,
+                )
+                created.append(property)
+                review.append(property)
+                continue
+            # Same as PropertySerializer.save, a new thumbnail goes back to review
+            if property.thumbnail.name != data["thumbnail"]:
+                property.status = Property.Status.PENDING_REVIEW
+                property.thumbnail_variants = {}
+                review.append(property)
+            moved.append(property.cordinates)
+            for field, value in data.items():
+                setattr(property, field, value)
+            property.modified = now
+            moved.append(property.cordinates)
+            updated.append(property)
+
+        Property.objects.bulk_create(created)
+        Property.objects.bulk_update(updated, self.update_fields)
+        self.created += len(created)
+        self.updated += len(updated)
+
+        ids = [property.id for property in review]
+        transaction.on_commit(lambda: enqueue_review(ids))
+        # bulk_update doesn't send post_save
+        transaction.on_commit(lambda: invalidate_caches(moved))
+
+
+def enqueue_review(ids):
+    size = settings.IMPORT_REVIEW_BATCH_SIZE
+    for start in range(0, len(ids), size):
+        classify_properties.delay(ids[start : start + size])
+
+
+def import_properties(agent, lines, format="ndjson", batch_size=None):
+    """Import a NDJSON or CSV feed given as an iterable of text lines"""
+    return PropertyImport(agent, batch_size).run(READERS[format](lines))
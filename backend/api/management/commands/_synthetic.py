@@ -0,0 +1,45 @@
+from django.db import connection
+
+from api.models import Property, RealEstateAgent
+
+# Points are spread over the bounding box of Great Britain
+INSERT_PROPERTIES = f"""
+    INSERT INTO {Property._meta.db_table} (
+        sale_type, thumbnail, title, address, price, date, property_type,
+        bedrooms, bathrooms, sqft, description, key_features, cordinates, agent_id,
+        status, thumbnail_variants, modified
+    )
+    SELECT
+        CASE WHEN random() < 0.5 THEN 'for_sale' ELSE 'to_rent' END,
+        'synthetic/' || i || '.jpg',
+        'Synthetic property ' || i,
+        i || ' Synthetic Street',
+        1000 + (random() * 999000)::int,
+        now() - random() * interval '60 days',
+        (ARRAY['House', 'Flat', 'Bungalow', 'Land'])[1 + (random() * 3)::int],
+        1 + (random() * 5)::int,
+        1 + (random() * 3)::int,
+        300 + (random() * 3000)::int,
+        'Synthetic property generated for benchmarks',
+        '["Garden", "Parking"]'::jsonb,
+        ST_SetSRID(ST_MakePoint(-6 + random() * 7.8, 50 + random() * 8.6), 4326),
+        %s,
+        'published',
+        '{{}}'::jsonb,
+        now()
+    FROM generate_series(1, %s) AS i
+"""
+
+
+def create_synthetic_properties(count):
+    agent = RealEstateAgent.objects.create(
+        name="Synthetic agency",
+        address="Synthetic Street",
+        phone_number="0",
+        descripton="",
+        cordinates="POINT(-0.1276474 51.5073219)",
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(INSERT_PROPERTIES, [agent.id, count])
+        cursor.execute(f"ANALYZE {Property._meta.db_table}")
+    return agent
@@ -0,0 +1,86 @@
+import statistics
+import time
+
+from django.contrib.gis.geos import GEOSGeometry
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.geocoding import geocode
+from api.models import Property
+from api.spatial import filter_in_area, filter_near
+
+from ._synthetic import create_synthetic_properties
+
+
+def measure(queryset, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ids = list(queryset.values_list("id", flat=True))
+        timings.append(time.perf_counter() - start)
+    return ids, timings
+
+
+class Command(BaseCommand):
+    help = "Compare property search query paths on synthetic data"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--address", default="London")
+        parser.add_argument("--properties", type=int, default=1_000_000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--radius",
+            type=float,
+            default=3219,
+            help="Metres around the area's centre for the radius paths",
+        )
+        parser.add_argument(
+            "--nearest", type=int, default=50, help="Rows for the nearest paths"
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep generated properties"
+        )
+
+    def handle(self, *args, **options):
+        geotext = geocode(options["address"])
+        if not geotext:
+            raise CommandError(f"Can't resolve {options['address']} to an area")
+
+        with transaction.atomic():
+            self.stdout.write(f"Generating {options['properties']} properties")
+            create_synthetic_properties(options["properties"])
+
+            paths = {
+                "intersects": Property.objects.filter(cordinates__intersects=geotext),
+                "subdivided": filter_in_area(Property.objects.all(), geotext),
+            }
+            results = {}
+            for name, queryset in paths.items():
+                results[name] = set(self.run(name, queryset, options["repeat"]))
+
+            if results["intersects"] != results["subdivided"]:
+                self.stderr.write("Query paths returned different rows")
+
+            # Radius and nearest searches around the centre of the same area
+            centre = GEOSGeometry(geotext, srid=4326).centroid
+            radius, limit = options["radius"], options["nearest"]
+            properties = Property.objects.all()
+            paths = {
+                "radius": filter_near(properties, centre, radius),
+                "nearest": filter_near(properties, centre, nearest=True)[:limit],
+                "both": filter_near(properties, centre, radius, True)[:limit],
+            }
+            for name, queryset in paths.items():
+                self.run(name, queryset, options["repeat"])
+
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+    def run(self, name, queryset, repeat):
+        ids, timings = measure(queryset, repeat)
+        self.stdout.write(
+            f"{name:<12} rows={len(ids):<8} "
+            f"min={min(timings) * 1000:.1f}ms "
+            f"median={statistics.median(timings) * 1000:.1f}ms"
+        )
+        return ids
@@ -0,0 +1,57 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import Property
+from api.serializers import PropertyListSerializer, PropertySerializer
+
+from ._synthetic import create_synthetic_properties
+
+
+def serialize_instances(queryset):
+    return PropertySerializer(queryset, many=True).data
+
+
+def serialize_rows(queryset):
+    return PropertyListSerializer(
+        PropertyListSerializer.select(queryset), many=True
+    ).data
+
+
+class Command(BaseCommand):
+    help = "Compare rows per second of the property list serializers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--properties", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep generated properties"
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write(f"Generating {options['properties']} properties")
+            agent = create_synthetic_properties(options["properties"])
+            queryset = Property.objects.filter(agent=agent).order_by("-date", "-id")
+
+            paths = {"serializer": serialize_instances, "list": serialize_rows}
+            for name, serialize in paths.items():
+                self.run(name, serialize, queryset, options["repeat"])
+
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+    def run(self, name, serialize, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            # The query is included, the list path selects fewer columns
+            rows = len(serialize(queryset.all()))
+            timings.append(time.perf_counter() - start)
+        self.stdout.write(
+            f"{name:<12} rows={rows:<8} "
+            f"median={statistics.median(timings) * 1000:.1f}ms "
+            f"rows/s={rows / statistics.median(timings):.0f}"
+        )
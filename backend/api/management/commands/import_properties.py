@@ -0,0 +1,45 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ingest import FORMATS, import_properties
+from api.models import RealEstateAgent
+
+
+class Command(BaseCommand):
+    help = "Import a NDJSON or CSV feed of properties, upserting on external_id"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--agent", type=int, required=True, help="Agent id")
+        parser.add_argument(
+            "--format", choices=FORMATS, help="Defaults to the file extension"
+        )
+        parser.add_argument("--batch-size", type=int)
+
+    def handle(self, *args, **options):
+        try:
+            agent = RealEstateAgent.objects.get(id=options["agent"])
+        except RealEstateAgent.DoesNotExist:
+            raise CommandError(f"Agent {options['agent']} doesn't exist")
+        format = options["format"] or options["path"].rsplit(".", 1)[-1].lower()
+        if format not in FORMATS:
+            raise CommandError(f"Unknown format {format}, use --format")
+
+        start = time.perf_counter()
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as f:
+                result = import_properties(agent, f, format, options["batch_size"])
+        except OSError as e:
+            raise CommandError(f"Can't read {options['path']}: {e}")
+        elapsed = time.perf_counter() - start
+
+        for error in result["errors"]:
+            self.stderr.write(f"Line {error['line']}: {json.dumps(error['errors'])}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {result['created']}, updated {result['updated']}, "
+                f"invalid {result['invalid']} in {elapsed:.1f}s"
+            )
+        )
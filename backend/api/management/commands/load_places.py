@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.contrib.gis.gdal import DataSource
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.geocoding import normalize_address
+from api.models import Place
+
+
+def to_multipolygon(geometry):
+    if isinstance(geometry, Polygon):
+        return MultiPolygon(geometry, srid=geometry.srid)
+    if isinstance(geometry, MultiPolygon):
+        return geometry
+    return None
+
+
+class Command(BaseCommand):
+    help = "Bulk load place boundaries from a GeoJSON file or shapefile"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--name-field", default="name", help="Feature attribute with place name"
+        )
+        parser.add_argument("--layer", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=settings.GAZETTEER_SIMPLIFY_TOLERANCE,
+            help="Simplification tolerance in degrees",
+        )
+        parser.add_argument(
+            "--clear", action="store_true", help="Delete existing places first"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            layer = DataSource(options["path"])[options["layer"]]
+        except Exception as e:
+            raise CommandError(f"Can't read {options['path']}: {e}")
+        if options["name_field"] not in layer.fields:
+            raise CommandError(
+                f"Field {options['name_field']} not found, choose one of {layer.fields}"
+            )
+
+        created = skipped = 0
+        batch = []
+        with transaction.atomic():
+            if options["clear"]:
+                Place.objects.all().delete()
+            for feature in layer:
+                name = str(feature.get(options["name_field"]) or "").strip()
+                geometry = feature.geom.geos
+                if geometry.srid != 4326:
+                    geometry.transform(4326)
+                polygon = to_multipolygon(geometry)
+                simplified = polygon and to_multipolygon(
+                    polygon.simplify(options["tolerance"], preserve_topology=True)
+                )
+                if not name or not simplified:
+                    skipped += 1
+                    continue
+                batch.append(
+                    Place(
+                        name=name,
+                        normalized_name=normalize_address(name),
+                        polygon=polygon,
+                        simplified_polygon=simplified,
+                    )
+                )
+                if len(batch) >= options["batch_size"]:
+                    created += len(Place.objects.bulk_create(batch))
+                    batch = []
+            created += len(Place.objects.bulk_create(batch))
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Loaded {created} places, skipped {skipped}")
+        )
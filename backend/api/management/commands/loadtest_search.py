@@ -0,0 +1,68 @@
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent clients against the property search endpoint. Start "
+        "the stub_geocoder command and an ASGI server with NOMINATIM_URL set "
+        "to the stub, e.g. uvicorn backend.asgi:application --workers 1"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url", default="http://127.0.0.1:8000/api/properties/search/"
+        )
+        parser.add_argument("--clients", type=int, default=500)
+        parser.add_argument("--requests", type=int, default=5000)
+        parser.add_argument(
+            "--unique-addresses",
+            type=float,
+            default=0.5,
+            help="Share of requests for addresses that aren't cached yet",
+        )
+
+    def handle(self, *args, **options):
+        timings, statuses, elapsed = asyncio.run(self.run(**options))
+        timings.sort()
+        self.stdout.write(
+            f"{len(timings)} requests with {options['clients']} clients "
+            f"in {elapsed:.1f}s, {len(timings) / elapsed:.1f} req/s"
+        )
+        self.stdout.write(
+            f"latency p50={statistics.median(timings) * 1000:.0f}ms "
+            f"p95={timings[int(len(timings) * 0.95)] * 1000:.0f}ms "
+            f"p99={timings[int(len(timings) * 0.99)] * 1000:.0f}ms"
+        )
+        self.stdout.write(f"status codes {dict(statuses)}")
+
+    async def run(self, url, clients, requests, unique_addresses, **options):
+        timings = []
+        statuses = {}
+        remaining = iter(range(requests))
+        limits = httpx.Limits(max_connections=clients)
+
+        async def client_loop(client):
+            for i in remaining:
+                if i % 100 < unique_addresses * 100:
+                    address = f"Stubtown {uuid.uuid4().hex}"
+                else:
+                    address = "Stubtown"
+                start = time.perf_counter()
+                try:
+                    response = await client.get(url, params={"address": address})
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                timings.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(client_loop(client) for _ in range(clients)))
+            return timings, statuses, time.perf_counter() - start
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand
+
+# Rough outline of Great Britain, so every synthetic property matches
+STUB_POLYGON = "POLYGON((-6 50,1.8 50,1.8 58.6,-6 58.6,-6 50))"
+
+
+class Command(BaseCommand):
+    help = "Serve a local Nominatim stand-in answering every search with a polygon"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8070)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.2,
+            help="Seconds to wait before answering, like the real service",
+        )
+
+    def handle(self, *args, **options):
+        self.latency = options["latency"]
+        self.body = json.dumps([{"geotext": STUB_POLYGON}]).encode()
+        self.stdout.write(
+            f"Stub geocoder on http://{options['host']}:{options['port']}/search, "
+            "point NOMINATIM_URL at it"
+        )
+        asyncio.run(self.serve(options["host"], options["port"]))
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            # Requests are GETs without a body, keep the connection alive
+            while await reader.readuntil(b"\r\n\r\n"):
+                await asyncio.sleep(self.latency)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/json\r\n"
+                    b"Content-Length: %d\r\n\r\n" % len(self.body) + self.body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
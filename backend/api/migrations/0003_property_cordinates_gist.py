@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_place"),
+    ]
+
+    # PointField creates this index itself, but databases restored from dumps
+    # or created before spatial_index was honoured may be missing it
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS api_property_cordinates_id "
+            "ON api_property USING GIST (cordinates);",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
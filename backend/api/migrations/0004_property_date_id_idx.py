@@ -0,0 +1,17 @@
+# Generated by Django 3.2.9 on 2021-11-22 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_property_cordinates_gist"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(fields=["-date", "-id"], name="property_date_id_idx"),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.9 on 2021-11-23 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_property_date_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["sale_type", "price"], name="property_sale_type_price_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["sale_type", "-date"], name="property_sale_type_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["sale_type", "bedrooms"], name="property_sale_bedrooms_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["property_type", "price"], name="property_type_price_idx"
+            ),
+        ),
+    ]
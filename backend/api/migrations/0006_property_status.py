@@ -0,0 +1,26 @@
+# Generated by Django 3.2.9 on 2021-11-25 16:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_property_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="property",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending_review", "Pending review"),
+                    ("published", "Published"),
+                    ("rejected", "Rejected"),
+                ],
+                default="published",
+                max_length=16,
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.9 on 2021-11-26 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_property_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImageClassification",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hash", models.CharField(max_length=64)),
+                ("labels", models.JSONField(default=list)),
+                ("verdict", models.BooleanField()),
+                ("model_version", models.CharField(max_length=64)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="imageclassification",
+            constraint=models.UniqueConstraint(
+                fields=("hash", "model_version"), name="unique_image_classification"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.9 on 2021-11-27 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_imageclassification"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="property",
+            name="thumbnail_variants",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
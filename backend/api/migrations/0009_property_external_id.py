@@ -0,0 +1,24 @@
+# Generated by Django 3.2.9 on 2021-11-28 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_property_thumbnail_variants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="property",
+            name="external_id",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name="property",
+            constraint=models.UniqueConstraint(
+                fields=("agent", "external_id"), name="unique_property_external_id"
+            ),
+        ),
+    ]
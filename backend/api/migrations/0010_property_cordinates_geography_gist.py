@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_property_external_id"),
+    ]
+
+    # Radius and nearest searches cast cordinates to geography, the expression
+    # must match api.spatial.filter_near for the planner to use this index
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS api_property_cordinates_geography_id "
+            "ON api_property USING GIST ((cordinates::geography(POINT, 4326)));",
+            reverse_sql="DROP INDEX IF EXISTS api_property_cordinates_geography_id;",
+        ),
+    ]
@@ -0,0 +1,58 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Title weighs the most, then the string values of key_features
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('english', coalesce({row}title, '')), 'A')
+    || setweight(
+        jsonb_to_tsvector('english', coalesce({row}key_features, '[]'), '["string"]'),
+        'B'
+    )
+    || setweight(to_tsvector('english', coalesce({row}description, '')), 'C')
+"""
+
+CREATE_TRIGGER_SQL = f"""
+    CREATE FUNCTION api_property_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {SEARCH_VECTOR_SQL.format(row="NEW.")};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER api_property_search_vector
+    BEFORE INSERT OR UPDATE OF title, key_features, description ON api_property
+    FOR EACH ROW EXECUTE FUNCTION api_property_search_vector_update();
+
+    UPDATE api_property SET search_vector = {SEARCH_VECTOR_SQL.format(row="")};
+"""
+
+DROP_TRIGGER_SQL = """
+    DROP TRIGGER IF EXISTS api_property_search_vector ON api_property;
+    DROP FUNCTION IF EXISTS api_property_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_property_cordinates_geography_gist"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="property",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        # Rows written by the ORM, bulk_create and raw SQL are all covered
+        migrations.RunSQL(CREATE_TRIGGER_SQL, reverse_sql=DROP_TRIGGER_SQL),
+        migrations.AddIndex(
+            model_name="property",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="property_search_vector_idx"
+            ),
+        ),
+    ]
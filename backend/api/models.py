@@ -1,5 +1,9 @@
+from django.contrib.auth import get_user_model
 from django.contrib.gis.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db.models import Avg, Count, Exists, OuterRef, Q
 from django.utils import timezone
 
 from backend.storage_backends import PublicMediaStorage
@@ -13,19 +17,78 @@ class RealEstateAgent(models.Model):
     cordinates = models.PointField()
 
 
+def owner_check(user):
+    """Whether user is in the agency of the property, a semi join on users"""
+    return Exists(
+        get_user_model().objects.filter(
+            pk=user.pk, real_estate_agency=OuterRef("agent")
+        )
+    )
+
+
+class PropertyQuerySet(models.QuerySet):
+    def published(self):
+        return self.filter(status=Property.Status.PUBLISHED)
+
+    def owned_by(self, user):
+        return self.filter(owner_check(user))
+
+    def visible_to(self, user):
+        """Published properties and any listing of the user's agency"""
+        if not user.is_authenticated:
+            return self.published()
+        return self.filter(owner_check(user) | Q(status=Property.Status.PUBLISHED))
+
+    def with_is_owner(self, user):
+        return self.annotate(is_owner=owner_check(user))
+
+    def stats(self):
+        """Counts and average price per sale type and counts per status"""
+        aggregates = {"count": Count("id")}
+        for sale_type in Property.SaleTypes.values:
+            matches = Q(sale_type=sale_type)
+            aggregates[f"{sale_type}_count"] = Count("id", filter=matches)
+            aggregates[f"{sale_type}_average_price"] = Avg("price", filter=matches)
+        for status in Property.Status.values:
+            aggregates[f"{status}_count"] = Count("id", filter=Q(status=status))
+        values = self.aggregate(**aggregates)
+        return {
+            "count": values["count"],
+            "sale_types": {
+                sale_type: {
+                    "count": values[f"{sale_type}_count"],
+                    "average_price": values[f"{sale_type}_average_price"],
+                }
+                for sale_type in Property.SaleTypes.values
+            },
+            "statuses": {
+                status: values[f"{status}_count"] for status in Property.Status.values
+            },
+        }
+
+
 class Property(models.Model):
     class SaleTypes(models.TextChoices):
         FOR_SALE = "for_sale", "For sale"
         TO_RENT = "to_rent", "To rent"
 
+    class Status(models.TextChoices):
+        PENDING_REVIEW = "pending_review", "Pending review"
+        PUBLISHED = "published", "Published"
+        REJECTED = "rejected", "Rejected"
+
     sale_type = models.CharField(max_length=8, choices=SaleTypes.choices)
     thumbnail = models.ImageField(storage=PublicMediaStorage)
+    # Resized copies of thumbnail, {format: {width: name}}
+    thumbnail_variants = models.JSONField(default=dict, blank=True)
     title = models.CharField(max_length=50)
     address = models.CharField(max_length=100)
     price = models.IntegerField(
         validators=[MinValueValidator(1000), MaxValueValidator(500_000_000)]
     )
     date = models.DateTimeField(default=timezone.now)
+    # Last change of any field, bulk_update and update_fields must set it
+    modified = models.DateTimeField(auto_now=True)
     property_type = models.CharField(max_length=25)
     bedrooms = models.IntegerField(
         validators=[MinValueValidator(1), MaxValueValidator(20)]
@@ -40,7 +103,86 @@ class Property(models.Model):
     key_features = models.JSONField(null=True)
     cordinates = models.PointField()
     agent = models.ForeignKey(RealEstateAgent, on_delete=models.CASCADE)
+    # Uploads through the API wait in pending_review until the thumbnail is
+    # classified, see api.tasks.classify_property
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PUBLISHED
+    )
+    # Agency's own listing id, bulk imports upsert on it
+    external_id = models.CharField(max_length=64, null=True, blank=True)
+    # Weighted title, key_features and description, kept up to date by the
+    # api_property_search_vector trigger, see migration 0011
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = PropertyQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Where the property was when loaded, its old map tiles change as well
+        instance._loaded_cordinates = instance.__dict__.get("cordinates")
+        return instance
 
     class Meta:
         verbose_name = "Property"
         verbose_name_plural = "Properties"
+        indexes = [
+            models.Index(fields=["-date", "-id"], name="property_date_id_idx"),
+            models.Index(
+                fields=["sale_type", "price"], name="property_sale_type_price_idx"
+            ),
+            models.Index(
+                fields=["sale_type", "-date"], name="property_sale_type_date_idx"
+            ),
+            models.Index(
+                fields=["sale_type", "bedrooms"], name="property_sale_bedrooms_idx"
+            ),
+            models.Index(
+                fields=["property_type", "price"], name="property_type_price_idx"
+            ),
+            GinIndex(fields=["search_vector"], name="property_search_vector_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["agent", "external_id"], name="unique_property_external_id"
+            )
+        ]
+
+
+class ImageClassification(models.Model):
+    hash = models.CharField(max_length=64)
+    labels = models.JSONField(default=list)
+    verdict = models.BooleanField()
+    model_version = models.CharField(max_length=64)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hash", "model_version"], name="unique_image_classification"
+            )
+        ]
+
+
+class Place(models.Model):
+    name = models.CharField(max_length=256)
+    normalized_name = models.CharField(max_length=256)
+    polygon = models.MultiPolygonField()
+    simplified_polygon = models.MultiPolygonField()
+
+    class Meta:
+        indexes = [
+            GinIndex(
+                name="place_name_trgm_idx",
+                fields=["normalized_name"],
+                opclasses=["gin_trgm_ops"],
+            ),
+            models.Index(
+                name="place_name_prefix_idx",
+                fields=["normalized_name"],
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,98 @@
+import base64
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate by the values of the last row of a page instead of an offset, so
+    every page is a single index range scan. Pages follow the ordering of the
+    queryset or ordering when it has none, it must be unique.
+    """
+
+    ordering = ("-date", "-id")
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = settings.SEARCH_PAGE_SIZE
+    max_page_size = settings.SEARCH_MAX_PAGE_SIZE
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = queryset.query.order_by or self.ordering
+        self.cursor = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        if self.cursor is not None:
+            try:
+                queryset = queryset.filter(self.get_position_filter(self.cursor))
+            except (TypeError, ValueError, DjangoValidationError):
+                # Cursor of a page with another ordering
+                raise NotFound(self.invalid_cursor_message)
+        rows = list(queryset[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_position_filter(self, values):
+        """Rows after (a, b, ...) are (a > x) or (a = x and b > y) or ..."""
+        position = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            position |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        return position
+
+    def get_row_values(self, row):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip("-")
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            values.append(value.isoformat() if isinstance(value, datetime) else value)
+        return values
+
+    def encode_cursor(self, values):
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        cursor = self.encode_cursor(self.get_row_values(self.page[-1]))
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict([("next", self.get_next_link()), ("properties", data)])
+        )
@@ -0,0 +1,47 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline delimited JSON, one object per line. Large exports are streamed
+    by the view, this renders regular responses such as errors.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        return "".join(encode_lines(rows)).encode()
+
+
+def encode_lines(rows):
+    encoder = JSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(row) + "\n"
+
+
+class ColumnarRenderer(JSONRenderer):
+    """Search hits as parallel arrays, see api.columnar"""
+
+    format = "columnar"
+
+
+class PackedRenderer(BaseRenderer):
+    """
+    Search hits as a buffer of little endian columns, see api.columnar.pack.
+    Errors are JSON objects, clients tell them apart by the status code.
+    """
+
+    media_type = "application/octet-stream"
+    format = "packed"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return JSONRenderer().render(data)
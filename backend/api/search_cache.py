@@ -0,0 +1,231 @@
+import hashlib
+import json
+import math
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry
+from redis import RedisError
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+from backend import metrics
+from helpers import LRUCache, get_redis
+
+from .filters import PROPERTY_MAX_AGE, filters_key
+from .pagination import KeysetPagination
+
+
+class SearchCache:
+    """
+    Serialized search pages in Redis keyed by the area, its generation and the
+    canonical filter and page params. Every cached area is registered with its
+    polygon in the grid cells its extent covers, a changed property gives the
+    areas of its cell that contain it a new generation. Registrations outlive
+    the pages cached under them and expire once the area isn't searched.
+    """
+
+    key_prefix = "search:"
+    generation_prefix = "search-generation:"
+    area_prefix = "search-area:"
+    # Sorted set of the areas overlapping a cell, scored by their expiry
+    cell_prefix = "search-cell:"
+    # Generation of every search, changes with any property
+    changes_key = "search-changes"
+
+    def __init__(self):
+        self.polygons = LRUCache(maxsize=256, ttl=settings.SEARCH_CACHE_TTL)
+
+    @property
+    def area_ttl(self):
+        return settings.SEARCH_CACHE_TTL * 2
+
+    def get_area(self, geotext):
+        return hashlib.sha1(geotext.encode()).hexdigest()
+
+    def make_key(self, request, area, generation):
+        paginator = KeysetPagination()
+        params = request.query_params
+        return ":".join(
+            [
+                f"{self.key_prefix}{area}",
+                generation,
+                filters_key(params),
+                str(PROPERTY_MAX_AGE.get_version(params) or ""),
+                str(paginator.get_page_size(request)),
+                params.get(paginator.cursor_query_param, ""),
+            ]
+        )
+
+    def get_generation(self, area):
+        generation = get_redis().get(self.generation_prefix + area)
+        return generation.decode() if generation is not None else "0"
+
+    def get_cell(self, lon, lat):
+        size = settings.SEARCH_CACHE_GRID_SIZE
+        return f"{math.floor(lon / size)}:{math.floor(lat / size)}"
+
+    def get_cells(self, extent):
+        size = settings.SEARCH_CACHE_GRID_SIZE
+        min_lon, min_lat, max_lon, max_lat = extent
+        for x in range(math.floor(min_lon / size), math.floor(max_lon / size) + 1):
+            for y in range(math.floor(min_lat / size), math.floor(max_lat / size) + 1):
+                yield f"{x}:{y}"
+
+    def track(self, area, geotext):
+        """
+        Register area so changes in it start a new generation and return its
+        generation, areas start with a unique one
+        """
+        generation_key = self.generation_prefix + area
+        with get_redis().pipeline(transaction=False) as pipe:
+            pipe.set(generation_key, time.time_ns(), nx=True, ex=self.area_ttl)
+            pipe.expire(generation_key, self.area_ttl)
+            pipe.get(generation_key)
+            pipe.ttl(self.area_prefix + area)
+            *_, generation, remaining = pipe.execute()
+        # The registration is renewed once per page TTL rather than per page
+        if remaining < settings.SEARCH_CACHE_TTL:
+            self.register(area, geotext)
+        return generation.decode()
+
+    def register(self, area, geotext):
+        expires = time.time() + self.area_ttl
+        with get_redis().pipeline(transaction=False) as pipe:
+            pipe.set(self.area_prefix + area, geotext, ex=self.area_ttl)
+            for cell in self.get_cells(GEOSGeometry(geotext).extent):
+                pipe.zadd(self.cell_prefix + cell, {area: expires})
+                pipe.expire(self.cell_prefix + cell, self.area_ttl)
+            pipe.execute()
+
+    def get_version(self, geotext):
+        """Generation of an area, the same until a property in it changes"""
+        area = self.get_area(geotext)
+        try:
+            generation = get_redis().get(self.generation_prefix + area)
+            if generation is None:
+                return self.track(area, geotext)
+        except RedisError:
+            return None
+        return generation.decode()
+
+    def get_changes_version(self):
+        """Generation of all searches, the same until any property changes"""
+        try:
+            with get_redis().pipeline(transaction=False) as pipe:
+                pipe.set(self.changes_key, time.time_ns(), nx=True)
+                pipe.get(self.changes_key)
+                return pipe.execute()[-1].decode()
+        except RedisError:
+            return None
+
+    def get(self, request, geotext):
+        """
+        (cached page or None, generation), the generation is read before the
+        search runs and passed to set
+        """
+        area = self.get_area(geotext)
+        cached = None
+        if generation := self.get_version(geotext):
+            try:
+                cached = get_redis().get(self.make_key(request, area, generation))
+            except RedisError:
+                pass
+        metrics.incr(
+            "search_cache.hits" if cached is not None else "search_cache.misses"
+        )
+        if cached is None:
+            return None, generation
+        data = json.loads(cached)
+        # Links are stored as the cursor, the host and params are per request
+        if cursor := data["next"]:
+            url = request.build_absolute_uri()
+            data["next"] = replace_query_param(
+                url, KeysetPagination.cursor_query_param, cursor
+            )
+        return data, generation
+
+    def set(self, request, geotext, generation, data):
+        """
+        Cache a page searched at generation, unless a property in the area
+        changed while the search ran
+        """
+        if generation is None:
+            return
+        area = self.get_area(geotext)
+        data = dict(data)
+        if data["next"]:
+            query = parse_qs(urlsplit(data["next"]).query)
+            data["next"] = query[KeysetPagination.cursor_query_param][0]
+        try:
+            if self.track(area, geotext) != generation:
+                return
+            key = self.make_key(request, area, generation)
+            get_redis().setex(
+                key, settings.SEARCH_CACHE_TTL, json.dumps(data, cls=JSONEncoder)
+            )
+        except RedisError:
+            pass
+
+    def get_polygon(self, area):
+        polygon = self.polygons.get(area)
+        if polygon is None:
+            geotext = get_redis().get(self.area_prefix + area)
+            if geotext is None:
+                return None
+            polygon = GEOSGeometry(geotext.decode()).prepared
+            self.polygons.set(area, polygon)
+        return polygon
+
+    def find_areas(self, points):
+        """Registered areas containing one of points, expired ones are pruned"""
+        cells = {}
+        for point in points:
+            cells.setdefault(self.get_cell(point.x, point.y), []).append(point)
+        now = time.time()
+        with get_redis().pipeline(transaction=False) as pipe:
+            for cell in cells:
+                pipe.zremrangebyscore(self.cell_prefix + cell, "-inf", now)
+                pipe.zrange(self.cell_prefix + cell, 0, -1)
+            results = pipe.execute()[1::2]
+        candidates = {}
+        for cell_points, areas in zip(cells.values(), results):
+            for area in areas:
+                candidates.setdefault(area.decode(), []).extend(cell_points)
+        changed = []
+        for area, area_points in candidates.items():
+            polygon = self.get_polygon(area)
+            # Without the polygon it's safer to assume the point is inside
+            if polygon is None or any(polygon.intersects(p) for p in area_points):
+                changed.append(area)
+        return changed
+
+    def invalidate_all(self):
+        """New generation for all searches, the version of uncached searches"""
+        try:
+            get_redis().set(self.changes_key, time.time_ns())
+        except RedisError:
+            pass
+
+    def invalidate(self, points):
+        """New generation for every cached area containing one of points"""
+        try:
+            changed = self.find_areas(points)
+            if not changed:
+                return
+            # Unique generations, an evicted counter starting over could repeat
+            # the version of an ETag a client still has
+            generation = time.time_ns()
+            with get_redis().pipeline(transaction=False) as pipe:
+                for area in changed:
+                    pipe.set(
+                        self.generation_prefix + area, generation, ex=self.area_ttl
+                    )
+                pipe.execute()
+        except RedisError:
+            return
+        metrics.incr("search_cache.evictions", len(changed))
+
+
+cache = SearchCache()
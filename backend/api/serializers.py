@@ -1,17 +1,25 @@
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework.exceptions import ParseError
 
 from .models import Property
-from .validators import is_property_in_image
+from .spatial import latitude, longitude
+from .tasks import classify_property
 
 
 class PropertySerializer(serializers.ModelSerializer):
+    thumbnail_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Property
         fields = [
             "id",
             "sale_type",
             "thumbnail",
+            "thumbnail_srcset",
             "title",
             "address",
             "price",
@@ -22,15 +30,108 @@ class PropertySerializer(serializers.ModelSerializer):
             "description",
             "key_features",
             "cordinates",
+            "status",
         ]
-        read_only_fields = ["id"]
+        read_only_fields = ["id", "status"]
 
     def save(self, **kwargs):
         agent = self.context["request"].user.real_estate_agency
         if not agent:
             raise ParseError("This user isn't assigned to any agency")
         self.validated_data["agent"] = agent
-        img = self.validated_data["thumbnail"]
-        if not is_property_in_image(img):
-            raise ParseError("Image doesn't contain property")
-        return super().save(**kwargs)
+        # New thumbnails are classified in the background before publishing
+        has_thumbnail = "thumbnail" in self.validated_data
+        if has_thumbnail:
+            self.validated_data["status"] = Property.Status.PENDING_REVIEW
+            self.validated_data["thumbnail_variants"] = {}
+        instance = super().save(**kwargs)
+        if has_thumbnail:
+            transaction.on_commit(lambda: classify_property.delay(instance.id))
+        return instance
+
+    def get_thumbnail_srcset(self, obj):
+        """{format: "url 320w, url 640w"} for responsive <img srcset>"""
+        storage = obj.thumbnail.storage
+        return {
+            format: ", ".join(
+                f"{storage.url(name)} {width}w" for width, name in sizes.items()
+            )
+            for format, sizes in obj.thumbnail_variants.items()
+        }
+
+
+class PropertyListSerializer(serializers.BaseSerializer):
+    """
+    Read only PropertySerializer for pages and exports of many properties.
+    Rows are dicts from select, coordinates come from SQL as floats and media
+    URLs are joined to MEDIA_URL, no model instances, geometries or storage
+    calls per row.
+    """
+
+    columns = [
+        "id",
+        "sale_type",
+        "thumbnail",
+        "thumbnail_variants",
+        "title",
+        "address",
+        "price",
+        "property_type",
+        "bedrooms",
+        "bathrooms",
+        "sqft",
+        "description",
+        "key_features",
+        "status",
+        "date",
+    ]
+
+    @classmethod
+    def select(cls, queryset):
+        """Only the columns to_representation reads and the ordering uses"""
+        ordering = [
+            name.lstrip("-")
+            for name in queryset.query.order_by
+            if isinstance(name, str) and name.lstrip("-") not in cls.columns
+        ]
+        return queryset.values(
+            *cls.columns,
+            *ordering,
+            lon=longitude(),
+            lat=latitude(),
+        )
+
+    def media_url(self, name):
+        return settings.MEDIA_URL + quote(name)
+
+    def format_coordinate(self, value):
+        return repr(value).removesuffix(".0")
+
+    def to_representation(self, row):
+        variants = row["thumbnail_variants"]
+        return {
+            "id": row["id"],
+            "sale_type": row["sale_type"],
+            "thumbnail": self.media_url(row["thumbnail"]) if row["thumbnail"] else None,
+            "thumbnail_srcset": {
+                format: ", ".join(
+                    f"{self.media_url(name)} {width}w" for width, name in sizes.items()
+                )
+                for format, sizes in variants.items()
+            },
+            "title": row["title"],
+            "address": row["address"],
+            "price": row["price"],
+            "property_type": row["property_type"],
+            "bedrooms": row["bedrooms"],
+            "bathrooms": row["bathrooms"],
+            "sqft": row["sqft"],
+            "description": row["description"],
+            "key_features": row["key_features"],
+            # Same EWKT as the PointField in PropertySerializer
+            "cordinates": (
+                f"SRID=4326;POINT ({self.format_coordinate(row['lon'])} "
+                f"{self.format_coordinate(row['lat'])})"
+            ),
+            "status": row["status"],
+        }
@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import search_cache, tiles
+from .models import Property
+from .tasks import invalidate_search_areas
+
+
+def invalidate_caches(points):
+    """Drop cached tiles and search pages that could show one of points"""
+    tiles.cache.invalidate(points)
+    search_cache.cache.invalidate_all()
+    # Looking up the cached areas around the points is left to a worker
+    invalidate_search_areas.delay([(point.x, point.y) for point in points])
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def property_changed(sender, instance, **kwargs):
+    points = [
+        point
+        for point in (
+            instance.cordinates,
+            getattr(instance, "_loaded_cordinates", None),
+        )
+        if point is not None
+    ]
+    transaction.on_commit(lambda: invalidate_caches(points))
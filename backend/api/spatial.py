@@ -0,0 +1,157 @@
+from django.conf import settings
+from django.contrib.gis.db.models import PointField
+from django.contrib.gis.db.models.aggregates import Collect
+from django.contrib.gis.db.models.functions import (
+    Centroid,
+    GeometryDistance,
+    SnapToGrid,
+)
+from django.contrib.gis.geos import Point, Polygon
+from django.contrib.gis.measure import D
+from django.db.models import Count, FloatField, Func, Max, Min
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+from rest_framework.exceptions import ValidationError
+
+from .models import Property
+
+SUBDIVIDED_INTERSECTS = f"""
+    SELECT property.id
+    FROM {Property._meta.db_table} property
+    JOIN (SELECT ST_Subdivide(ST_GeomFromText(%s, 4326), %s) AS geom) part
+    ON property.cordinates && part.geom
+    AND ST_Intersects(property.cordinates, part.geom)
+"""
+
+
+def longitude(field="cordinates"):
+    return Func(field, function="ST_X", output_field=FloatField())
+
+
+def latitude(field="cordinates"):
+    return Func(field, function="ST_Y", output_field=FloatField())
+
+
+def filter_in_area(queryset, geotext):
+    """
+    Filter properties inside polygon. Rows are prefiltered by the bounding box
+    of the whole area, then tested against small subdivided parts of it, so
+    both steps are answered from the GiST index on cordinates.
+    """
+    subdivided = RawSQL(
+        SUBDIVIDED_INTERSECTS, (geotext, settings.SEARCH_SUBDIVIDE_MAX_VERTICES)
+    )
+    return queryset.filter(cordinates__bboverlaps=geotext, id__in=subdivided)
+
+
+def parse_sort(params, near):
+    sort = params.get("sort", "date")
+    if sort not in ("date", "distance", "relevance"):
+        raise ValidationError({"sort": ["Choose one of date, distance, relevance."]})
+    if sort == "distance" and not near:
+        raise ValidationError({"sort": ["Distance requires lat and lon."]})
+    return sort
+
+
+def parse_near(params):
+    """
+    (point, radius in metres or None, nearest first) from the lat, lon, radius
+    and sort params, None when searching by address. sort is validated in
+    either case.
+    """
+    if "lat" not in params and "lon" not in params:
+        parse_sort(params, near=False)
+        return None
+    try:
+        lon, lat = float(params["lon"]), float(params["lat"])
+    except (KeyError, ValueError):
+        raise ValidationError({"lat": ["Both lat and lon must be valid numbers."]})
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        raise ValidationError({"lat": ["Point is out of range."]})
+
+    radius = params.get("radius")
+    if radius:
+        try:
+            radius = float(radius)
+        except ValueError:
+            raise ValidationError({"radius": ["A valid number is required."]})
+        if not 0 < radius <= settings.SEARCH_MAX_RADIUS:
+            raise ValidationError(
+                {"radius": [f"Choose up to {settings.SEARCH_MAX_RADIUS} metres."]}
+            )
+    else:
+        radius = None
+
+    sort = parse_sort(params, near=True)
+    if radius is None and sort != "distance":
+        raise ValidationError({"radius": ["Required unless sorting by distance."]})
+    return Point(lon, lat, srid=4326), radius, sort == "distance"
+
+
+def filter_near(queryset, point, radius=None, nearest=False):
+    """
+    Properties within radius metres of point and or nearest first. Both use
+    the GiST index on cordinates::geography, distances are on the spheroid.
+    """
+    queryset = queryset.alias(
+        geography=Cast("cordinates", PointField(geography=True, srid=4326))
+    )
+    if radius is not None:
+        queryset = queryset.filter(geography__dwithin=(point, D(m=radius)))
+    if nearest:
+        # <-> ordering is answered by walking the index, no sort of all matches
+        queryset = queryset.annotate(
+            distance=GeometryDistance("geography", point)
+        ).order_by("distance", "id")
+    return queryset
+
+
+def parse_bbox(value):
+    """ "min_lon,min_lat,max_lon,max_lat" into a Polygon"""
+    try:
+        min_lon, min_lat, max_lon, max_lat = map(float, value.split(","))
+    except (AttributeError, ValueError):
+        raise ValidationError({"bbox": ["Expected min_lon,min_lat,max_lon,max_lat."]})
+    if not (-180 <= min_lon < max_lon <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise ValidationError({"bbox": ["Bounding box is out of range."]})
+    return Polygon.from_bbox((min_lon, min_lat, max_lon, max_lat))
+
+
+def parse_zoom(value):
+    try:
+        zoom = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({"zoom": ["A valid integer is required."]})
+    if not 0 <= zoom <= settings.MAP_MAX_ZOOM:
+        raise ValidationError({"zoom": [f"Choose 0 to {settings.MAP_MAX_ZOOM}."]})
+    return zoom
+
+
+def grid_size(zoom):
+    """Cell size in degrees, a 256px web map tile spans 360 / 2^zoom degrees"""
+    return 360 / 2**zoom / settings.CLUSTER_CELLS_PER_TILE
+
+
+def cluster_properties(queryset, bbox, zoom):
+    """
+    Group properties inside bbox into grid cells sized for the zoom level, so
+    the number of clusters depends on the map size and not on the listings
+    """
+    size = grid_size(zoom)
+    min_lon, min_lat, max_lon, max_lat = bbox.extent
+    cells = ((max_lon - min_lon) / size + 1) * ((max_lat - min_lat) / size + 1)
+    if cells > settings.CLUSTER_MAX_CELLS:
+        raise ValidationError({"bbox": ["Bounding box is too large for zoom."]})
+
+    return (
+        queryset.filter(cordinates__bboverlaps=bbox)
+        .annotate(cell=SnapToGrid("cordinates", size))
+        .values("cell")
+        .annotate(
+            count=Count("id"),
+            center=Centroid(Collect("cordinates")),
+            price_min=Min("price"),
+            price_max=Max("price"),
+        )
+        .values("count", "center", "price_min", "price_max")
+    )
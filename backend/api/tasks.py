@@ -0,0 +1,76 @@
+import logging
+
+from botocore.exceptions import BotoCoreError, ClientError
+from celery import shared_task
+from django.contrib.gis.geos import Point
+from PIL import Image
+
+from backend import metrics
+
+from . import search_cache
+from .models import Property
+from .thumbnails import generate_variants
+from .validators import is_property_in_image
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(
+    autoretry_for=(BotoCoreError, ClientError), retry_backoff=True, max_retries=5
+)
+def classify_property(id):
+    try:
+        property = Property.objects.get(id=id, status=Property.Status.PENDING_REVIEW)
+    except Property.DoesNotExist:
+        return
+    review(property)
+
+
+@shared_task(
+    autoretry_for=(BotoCoreError, ClientError), retry_backoff=True, max_retries=5
+)
+def classify_properties(ids):
+    """Batch variant for imports, rows reviewed before a retry are skipped"""
+    pending = Property.objects.filter(id__in=ids, status=Property.Status.PENDING_REVIEW)
+    for property in pending.iterator():
+        review(property)
+
+
+def review(property):
+    try:
+        published = is_property_in_image(property.thumbnail)
+    except (BotoCoreError, ClientError):
+        # Retried by the task
+        raise
+    except Exception:
+        # e.g. a missing or unreadable thumbnail, retrying won't help and the
+        # listing would stay pending forever
+        logger.exception("Couldn't review the thumbnail of property %s", property.id)
+        metrics.incr("image_classification.errors")
+        published = False
+    if published:
+        property.status = Property.Status.PUBLISHED
+    else:
+        property.status = Property.Status.REJECTED
+    property.save(update_fields=["status", "modified"])
+    if property.status == Property.Status.PUBLISHED:
+        generate_thumbnail_variants.delay(property.id)
+
+
+@shared_task
+def invalidate_search_areas(coordinates):
+    """New generation for the cached search areas around (lon, lat) pairs"""
+    search_cache.cache.invalidate([Point(lon, lat) for lon, lat in coordinates])
+
+
+@shared_task
+def generate_thumbnail_variants(id):
+    try:
+        property = Property.objects.get(id=id)
+    except Property.DoesNotExist:
+        return
+    try:
+        property.thumbnail_variants = generate_variants(property.thumbnail)
+    except (OSError, Image.DecompressionBombError):
+        return
+    property.save(update_fields=["thumbnail_variants", "modified"])
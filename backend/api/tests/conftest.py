@@ -1,8 +1,20 @@
 import pytest
 import requests
-from django.contrib.gis.geos import Point
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
 from django.test import Client
 from model_bakery import baker
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from helpers import get_redis
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Cached pages and tiles outlive the test database"""
+    redis = get_redis()
+    for pattern in ("search*", "tile*"):
+        for key in redis.scan_iter(pattern):
+            redis.delete(key)
 
 
 @pytest.fixture
@@ -19,3 +31,31 @@ def property():
     return baker.make(
         "api.Property", cordinates=Point(float(data["lon"]), float(data["lat"]))
     )
+
+
+@pytest.fixture
+def place():
+    polygon = MultiPolygon(Polygon.from_bbox((-0.51, 51.28, 0.33, 51.69)))
+    return baker.make(
+        "api.Place",
+        name="Greater London",
+        normalized_name="greater london",
+        polygon=polygon,
+        simplified_polygon=polygon,
+    )
+
+
+@pytest.fixture
+def agent():
+    return baker.make("api.RealEstateAgent")
+
+
+@pytest.fixture
+def agent_user(agent):
+    return baker.make("users.CustomUser", real_estate_agency=agent)
+
+
+@pytest.fixture
+def auth_headers(agent_user):
+    token = RefreshToken.for_user(agent_user).access_token
+    return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
@@ -0,0 +1,61 @@
+import threading
+from unittest import mock
+
+import psycopg2
+import pytest
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+
+from backend.db.pool import ConnectionPool
+
+
+def make_connection():
+    connection = mock.Mock(closed=0)
+    connection.info.transaction_status = TRANSACTION_STATUS_IDLE
+    return connection
+
+
+def make_pool(**kwargs):
+    config = {"size": 2, "max_lifetime": 60, "check_interval": 30, "timeout": 0.1}
+    config.update(kwargs)
+    return ConnectionPool(mock.Mock(side_effect=make_connection), **config)
+
+
+class TestConnectionPool:
+    def test_connections_are_reused(self):
+        pool = make_pool()
+        connection = pool.checkout()
+        pool.checkin(connection)
+        assert pool.checkout() is connection
+        assert pool.connect.call_count == 1
+
+    def test_checkout_waits_for_free_connection(self):
+        pool = make_pool()
+        first, second = pool.checkout(), pool.checkout()
+        with pytest.raises(psycopg2.OperationalError):
+            pool.checkout()
+        threading.Timer(0.02, pool.checkin, [first]).start()
+        pool.timeout = 1
+        assert pool.checkout() is first
+        pool.checkin(second)
+
+    def test_open_transaction_is_rolled_back(self):
+        pool = make_pool()
+        connection = pool.checkout()
+        connection.info.transaction_status = TRANSACTION_STATUS_INTRANS
+        pool.checkin(connection)
+        connection.rollback.assert_called_once()
+
+    def test_broken_connection_is_replaced(self):
+        pool = make_pool(check_interval=0)
+        connection = pool.checkout()
+        pool.checkin(connection)
+        connection.cursor.side_effect = psycopg2.OperationalError
+        assert pool.checkout() is not connection
+        connection.close.assert_called_once()
+
+    def test_old_connection_is_replaced(self):
+        pool = make_pool(max_lifetime=0)
+        connection = pool.checkout()
+        pool.checkin(connection)
+        assert pool.checkout() is not connection
+        connection.close.assert_called_once()
@@ -0,0 +1,58 @@
+import pytest
+from django.db import connection
+from django.http import QueryDict
+from rest_framework.exceptions import ValidationError
+
+from api.filters import filter_properties
+from api.models import Property
+
+
+def make_params(**params):
+    query = QueryDict(mutable=True)
+    query.update(params)
+    return query
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "params,indexes",
+    [
+        (
+            {"sale_type": "for_sale"},
+            [
+                "property_sale_type_price_idx",
+                "property_sale_type_date_idx",
+                "property_sale_bedrooms_idx",
+            ],
+        ),
+        (
+            {"sale_type": "for_sale", "price_min": "100000", "price_max": "200000"},
+            ["property_sale_type_price_idx"],
+        ),
+        ({"sale_type": "to_rent", "days_old": "7d"}, ["property_sale_type_date_idx"]),
+        (
+            {"sale_type": "for_sale", "bedrooms_min": "2", "bedrooms_max": "3"},
+            ["property_sale_bedrooms_idx"],
+        ),
+        (
+            {"property_type": "House", "price_max": "300000"},
+            ["property_type_price_idx"],
+        ),
+        ({"days_old": "1d"}, ["property_date_id_idx"]),
+        ({"q": "garden", "sale_type": "for_sale"}, ["property_search_vector_idx"]),
+    ],
+)
+def test_filter_combination_uses_index(params, indexes):
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+    plan = filter_properties(Property.objects.all(), make_params(**params)).explain()
+    # Any index matches with seqscan off, the primary key one included
+    assert any(index in plan for index in indexes), plan
+
+
+@pytest.mark.parametrize(
+    "params", [{"price_min": "cheap"}, {"bedrooms_max": "1.5"}, {"days_old": "2d"}]
+)
+def test_invalid_filter_value(params):
+    with pytest.raises(ValidationError):
+        filter_properties(Property.objects.none(), make_params(**params))
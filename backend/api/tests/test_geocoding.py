@@ -0,0 +1,101 @@
+from unittest import mock
+
+import httpx
+import pytest
+import requests
+from asgiref.sync import async_to_sync
+from django.contrib.gis.geos import Point
+from django.test import AsyncClient
+from django.urls import reverse
+from model_bakery import baker
+
+from api.geocoding import (
+    async_geocoder,
+    cache,
+    fetch_polygon,
+    geocode,
+    normalize_address,
+)
+
+
+def test_normalize_address():
+    assert normalize_address("  London,  UK ") == "london uk"
+    assert normalize_address("LONDON uk") == "london uk"
+
+
+@pytest.mark.django_db
+class TestGeocodingCache:
+    def test_repeated_search_is_served_from_cache(self, client, property):
+        cache.delete("London")
+        with mock.patch("api.geocoding.fetch_polygon", wraps=fetch_polygon) as fetch:
+            response = client.get(reverse("properties-list"), {"address": "London"})
+            assert response.status_code == 200
+            response = client.get(reverse("properties-list"), {"address": " london"})
+            assert response.status_code == 200
+        assert fetch.call_count == 1
+        assert len(response.data["properties"]) == 1
+
+    def test_address_without_polygon_is_cached(self, client):
+        address = "qwxzqwxz nowhere"
+        cache.delete(address)
+        with mock.patch("api.geocoding.fetch_polygon", wraps=fetch_polygon) as fetch:
+            response = client.get(reverse("properties-list"), {"address": address})
+            assert response.status_code == 404
+            response = client.get(reverse("properties-list"), {"address": address})
+            assert response.status_code == 404
+        assert fetch.call_count == 1
+
+
+@pytest.mark.django_db
+class TestGazetteer:
+    def test_place_is_resolved_locally(self, client, place):
+        baker.make("api.Property", cordinates=Point(-0.1276474, 51.5073219))
+        with mock.patch("api.geocoding.fetch_polygon") as fetch:
+            response = client.get(
+                reverse("properties-list"), {"address": "Greater London"}
+            )
+        fetch.assert_not_called()
+        assert response.status_code == 200
+        assert len(response.data["properties"]) == 1
+
+    def test_place_is_resolved_by_prefix_and_typo(self, place):
+        with mock.patch("api.geocoding.fetch_polygon") as fetch:
+            assert geocode("greater lon") == place.simplified_polygon.wkt
+            assert geocode("Greater Londom") == place.simplified_polygon.wkt
+        fetch.assert_not_called()
+
+
+@pytest.mark.django_db
+class TestGeocodingErrors:
+    def test_non_json_response_is_unavailable(self, client):
+        address = "unreachable street"
+        cache.delete(address)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b"<html>Bad gateway</html>"
+        with mock.patch("requests.Session.get", return_value=response):
+            response = client.get(reverse("properties-list"), {"address": address})
+        assert response.status_code == 503
+        assert cache.get(address) is None
+
+    def test_async_timeout_is_unavailable(self):
+        address = "unreachable street"
+        cache.delete(address)
+        with mock.patch.object(
+            httpx.AsyncClient, "get", side_effect=httpx.ReadTimeout("timed out")
+        ):
+            response = async_to_sync(AsyncClient().get)(
+                reverse("properties-search"), {"address": address}
+            )
+        assert response.status_code == 503
+        assert cache.get(address) is None
+
+    def test_client_of_previous_loop_is_closed(self):
+        async def setup():
+            await async_geocoder.setup()
+            return async_geocoder.client
+
+        first = async_to_sync(setup)()
+        second = async_to_sync(setup)()
+        assert first.is_closed
+        assert second is not first
@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+from unittest import mock
+
+import pytest
+from django.urls import reverse
+
+from api.ingest import import_properties, thumbnail_prefix
+from api.models import Property
+
+
+def make_row(agent, external_id, **kwargs):
+    return {
+        "external_id": external_id,
+        "sale_type": "for_sale",
+        "thumbnail": f"{thumbnail_prefix(agent)}{external_id}.jpg",
+        "title": "Flat",
+        "address": "London",
+        "price": 250_000,
+        "property_type": "Flat",
+        "bedrooms": 2,
+        "bathrooms": 1,
+        "sqft": 700,
+        "description": "Flat in London",
+        "key_features": ["Garden"],
+        "cordinates": "POINT (-0.1276474 51.5073219)",
+        **kwargs,
+    }
+
+
+def to_ndjson(rows):
+    return [json.dumps(row) + "\n" for row in rows]
+
+
+@pytest.mark.django_db(transaction=True)
+class TestImportProperties:
+    @pytest.fixture(autouse=True)
+    def classify(self):
+        with mock.patch("api.ingest.classify_properties") as task:
+            yield task
+
+    @pytest.fixture(autouse=True)
+    def uploaded(self, agent):
+        """Images of the agency, the ones make_row uses and old/1.jpg"""
+        prefix = thumbnail_prefix(agent)
+
+        def listdir(path):
+            if path == prefix:
+                return ["old"], [f"{i}.jpg" for i in range(5)] + ["new.jpg"]
+            return [], ["1.jpg"]
+
+        storage = Property.thumbnail.field.storage
+        with mock.patch.object(storage, "listdir", side_effect=listdir) as listdir:
+            yield listdir
+
+    def test_import_creates_properties(self, agent, classify):
+        rows = [make_row(agent, str(i)) for i in range(5)]
+        result = import_properties(agent, to_ndjson(rows), batch_size=2)
+        assert result == {"created": 5, "updated": 0, "invalid": 0, "errors": []}
+        properties = Property.objects.filter(agent=agent)
+        assert properties.count() == 5
+        assert {p.status for p in properties} == {"pending_review"}
+        assert sum(len(c.args[0]) for c in classify.delay.call_args_list) == 5
+
+    def test_import_upserts_on_external_id(self, agent, classify):
+        import_properties(
+            agent, to_ndjson([make_row(agent, "1"), make_row(agent, "2")])
+        )
+        Property.objects.update(status="published")
+        classify.reset_mock()
+
+        rows = [
+            make_row(agent, "1", price=300_000),
+            make_row(agent, "2", thumbnail=f"{thumbnail_prefix(agent)}new.jpg"),
+        ]
+        result = import_properties(agent, to_ndjson(rows))
+        assert result["created"] == 0
+        assert result["updated"] == 2
+        first, second = Property.objects.order_by("external_id")
+        assert first.price == 300_000
+        assert first.status == "published"
+        assert second.status == "pending_review"
+        classify.delay.assert_called_once_with([second.id])
+
+    def test_import_reports_invalid_rows(self, agent):
+        rows = [make_row(agent, "1"), make_row(agent, "2", bedrooms=50)]
+        lines = to_ndjson(rows) + ["{"]
+        result = import_properties(agent, lines)
+        assert result["created"] == 1
+        assert result["invalid"] == 2
+        assert [error["line"] for error in result["errors"]] == [2, 3]
+        assert "bedrooms" in result["errors"][0]["errors"]
+
+    def test_import_csv(self, agent):
+        row = make_row(agent, "1")
+        row["key_features"] = json.dumps(row["key_features"])
+        feed = io.StringIO()
+        writer = csv.DictWriter(feed, fieldnames=row)
+        writer.writeheader()
+        writer.writerow(row)
+        feed.seek(0)
+        result = import_properties(agent, feed, "csv")
+        assert result["created"] == 1
+        assert Property.objects.get().key_features == ["Garden"]
+
+    def test_bulk_endpoint(self, client, agent, auth_headers):
+        response = client.post(
+            reverse("properties-bulk"),
+            "".join(to_ndjson([make_row(agent, "1")])),
+            content_type="application/x-ndjson",
+            **auth_headers,
+        )
+        assert response.status_code == 200
+        assert response.data["created"] == 1
+
+    def test_import_checks_thumbnails(self, agent):
+        prefix = thumbnail_prefix(agent)
+        rows = [
+            make_row(agent, "1", thumbnail="agencies/0/1.jpg"),
+            make_row(agent, "2", thumbnail=f"{prefix}../0/1.jpg"),
+            make_row(agent, "3", thumbnail=f"{prefix}missing.jpg"),
+            make_row(agent, "4", thumbnail=f"{prefix}old/1.jpg"),
+        ]
+        result = import_properties(agent, to_ndjson(rows))
+        assert result["created"] == 1
+        assert result["invalid"] == 3
+        assert all("thumbnail" in error["errors"] for error in result["errors"])
+
+    def test_thumbnails_are_listed_once(self, agent, uploaded):
+        storage = Property.thumbnail.field.storage
+        rows = [make_row(agent, str(i)) for i in range(5)]
+        with mock.patch.object(storage, "exists") as exists:
+            result = import_properties(agent, to_ndjson(rows), batch_size=2)
+        assert result["created"] == 5
+        exists.assert_not_called()
+        # The agency's folder and its old/ subfolder, not a request per row
+        assert uploaded.call_count == 2
@@ -0,0 +1,74 @@
+import time
+from unittest import mock
+
+import pytest
+from django.http import QueryDict
+
+from api.models import Property
+from api.tiles import render_tile
+from backend.routers import (
+    ReplicaRouter,
+    is_healthy,
+    measure_lag,
+    pin_user,
+    reads_after,
+    request_user,
+    use_replica,
+)
+
+
+@pytest.fixture
+def replicas(settings):
+    settings.DATABASE_REPLICAS = ["replica_0"]
+    with mock.patch("backend.routers.is_healthy", return_value=True) as is_healthy:
+        yield is_healthy
+
+
+class TestReplicaRouter:
+    router = ReplicaRouter()
+
+    def test_reads_outside_use_replica_use_default(self, replicas):
+        assert self.router.db_for_read(Property) == "default"
+
+    def test_reads_in_use_replica_use_replica(self, replicas):
+        with use_replica():
+            assert self.router.db_for_read(Property) == "replica_0"
+            assert self.router.db_for_write(Property) == "default"
+
+    def test_lagging_replica_falls_back_to_default(self, replicas):
+        replicas.return_value = False
+        with use_replica():
+            assert self.router.db_for_read(Property) == "default"
+
+    def test_reads_after_recent_write_use_default(self, replicas):
+        with use_replica():
+            with reads_after(time.time_ns()):
+                assert self.router.db_for_read(Property) == "default"
+            with reads_after(str(time.time_ns() - 60 * 10**9)):
+                assert self.router.db_for_read(Property) == "replica_0"
+            with reads_after(None):
+                assert self.router.db_for_read(Property) == "replica_0"
+
+    def test_user_is_pinned_after_write(self, replicas):
+        pin_user(123)
+        with request_user(123), use_replica():
+            assert self.router.db_for_read(Property) == "default"
+        with request_user(456), use_replica():
+            assert self.router.db_for_read(Property) == "replica_0"
+
+
+@pytest.mark.django_db
+def test_tiles_are_rendered_on_routed_connection():
+    with mock.patch(
+        "api.tiles.router.db_for_read", return_value="default"
+    ) as db_for_read:
+        render_tile(10, 511, 340, QueryDict())
+    db_for_read.assert_called_once_with(Property)
+
+
+@pytest.mark.django_db
+def test_server_not_streaming_wal_is_unhealthy(settings):
+    # default is a primary, it doesn't receive WAL like a stopped replica
+    settings.REPLICA_LAG_CHECK_INTERVAL = 0
+    assert measure_lag("default") is None
+    assert not is_healthy("default")
@@ -0,0 +1,94 @@
+import time
+from unittest import mock
+
+import pytest
+from django.contrib.gis.geos import Point
+from django.test import override_settings
+from django.urls import reverse
+from model_bakery import baker
+
+from api.pagination import KeysetPagination
+from api.search_cache import cache
+from helpers import get_redis
+
+
+@pytest.mark.django_db
+class TestSearchCache:
+    def search(self, client, **params):
+        return client.get(reverse("properties-list"), {"address": "London", **params})
+
+    def get_area(self):
+        key = next(get_redis().scan_iter(f"{cache.area_prefix}*")).decode()
+        return key[len(cache.area_prefix) :]
+
+    def test_repeated_search_is_served_from_cache(self, client, property):
+        first = self.search(client, page_size=1)
+        with mock.patch.object(KeysetPagination, "paginate_queryset") as paginate:
+            second = self.search(client, page_size=1)
+        paginate.assert_not_called()
+        assert second.data == first.data
+
+    def test_cache_is_keyed_on_filters(self, client, property):
+        self.search(client)
+        response = self.search(client, price_min=property.price + 1)
+        assert response.data["properties"] == []
+
+    def test_next_link_uses_current_request(self, client, property):
+        baker.make("api.Property", cordinates=Point(-0.1276474, 51.5073219))
+        self.search(client, page_size=1)
+        response = self.search(client, page_size=1, unrelated="1")
+        assert "unrelated=1" in response.data["next"]
+        assert "cursor=" in response.data["next"]
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_property_in_area_evicts_cached_search(
+        self, client, property, django_capture_on_commit_callbacks
+    ):
+        self.search(client)
+        with django_capture_on_commit_callbacks(execute=True):
+            baker.make("api.Property", cordinates=Point(-0.1276474, 51.5073219))
+        assert len(self.search(client).data["properties"]) == 2
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_property_outside_area_keeps_cached_search(
+        self, client, property, django_capture_on_commit_callbacks
+    ):
+        self.search(client)
+        area = self.get_area()
+        generation = cache.get_generation(area)
+        with django_capture_on_commit_callbacks(execute=True):
+            baker.make("api.Property", cordinates=Point(-2.2426305, 53.4807593))
+        assert cache.get_generation(area) == generation
+
+    def test_page_searched_before_a_change_isnt_cached(self, client, property):
+        paginate = KeysetPagination.paginate_queryset
+
+        def change_during_search(*args, **kwargs):
+            cache.invalidate([property.cordinates])
+            return paginate(*args, **kwargs)
+
+        with mock.patch.object(
+            KeysetPagination, "paginate_queryset", change_during_search
+        ):
+            self.search(client)
+        assert not list(get_redis().scan_iter(f"{cache.key_prefix}*"))
+
+    def test_areas_expire(self, client, property):
+        self.search(client)
+        redis = get_redis()
+        area = self.get_area()
+        cell = cache.cell_prefix + cache.get_cell(*property.cordinates.coords)
+        assert redis.zscore(cell, area) is not None
+        for key in (cache.area_prefix + area, cache.generation_prefix + area, cell):
+            assert 0 < redis.ttl(key) <= cache.area_ttl
+
+        with mock.patch("time.time", return_value=time.time() + cache.area_ttl + 1):
+            assert cache.find_areas([property.cordinates]) == []
+        assert redis.zcard(cell) == 0
+
+    def test_area_is_registered_once_per_ttl(self, client, property):
+        self.search(client)
+        with mock.patch.object(cache, "register") as register:
+            self.search(client, price_min=1)
+        register.assert_not_called()
+        assert cache.find_areas([property.cordinates]) == [self.get_area()]
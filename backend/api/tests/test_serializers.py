@@ -0,0 +1,53 @@
+import pytest
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry, Point
+from model_bakery import baker
+
+from api.models import Property
+from api.serializers import PropertyListSerializer, PropertySerializer
+from api.spatial import filter_near
+
+
+@pytest.mark.django_db
+class TestPropertyListSerializer:
+    @pytest.fixture
+    def property(self):
+        return baker.make(
+            "api.Property",
+            key_features=["Garden"],
+            cordinates=Point(-0.1276474, 51.5073219),
+        )
+
+    def serialize(self, queryset):
+        return PropertyListSerializer(
+            PropertyListSerializer.select(queryset), many=True
+        ).data
+
+    def test_matches_property_serializer(self, property):
+        [data] = self.serialize(Property.objects.all())
+        expected = PropertySerializer(property).data
+        assert data.keys() == expected.keys()
+        for field in data.keys() - {"thumbnail", "thumbnail_srcset", "cordinates"}:
+            assert data[field] == expected[field], field
+        assert GEOSGeometry(data["cordinates"]) == GEOSGeometry(expected["cordinates"])
+        assert GEOSGeometry(data["cordinates"]).srid == 4326
+
+    def test_media_urls(self, property):
+        Property.objects.update(
+            thumbnail="properties/house 1.jpg",
+            thumbnail_variants={"webp": {"320": "properties/house 1-320.webp"}},
+        )
+        [data] = self.serialize(Property.objects.all())
+        assert data["thumbnail"] == f"{settings.MEDIA_URL}properties/house%201.jpg"
+        assert data["thumbnail_srcset"] == {
+            "webp": f"{settings.MEDIA_URL}properties/house%201-320.webp 320w"
+        }
+
+    def test_select_keeps_ordering_columns(self, property):
+        queryset = filter_near(
+            Property.objects.all(), property.cordinates, nearest=True
+        )
+        [row] = PropertyListSerializer.select(queryset)
+        assert "distance" in row
+        assert row["lon"] == property.cordinates.x
+        assert row["lat"] == property.cordinates.y
@@ -0,0 +1,31 @@
+from io import BytesIO
+
+from PIL import Image
+
+from api.thumbnails import available_formats, render_variants
+
+
+def make_image(size, format="JPEG"):
+    buffer = BytesIO()
+    Image.new("RGB", size, "red").save(buffer, format)
+    buffer.seek(0)
+    return buffer
+
+
+def test_render_variants():
+    variants = list(render_variants(make_image((2000, 1000)), widths=(320, 640)))
+    assert [(format, width) for format, width, _ in variants] == [
+        (format, width) for width in (640, 320) for format in available_formats()
+    ]
+    for format, width, content in variants:
+        image = Image.open(BytesIO(content))
+        assert image.format == format.upper()
+        assert image.size == (width, width // 2)
+
+
+def test_render_variants_does_not_upscale():
+    variants = list(render_variants(make_image((500, 500), "PNG"), widths=(320, 640)))
+    assert {width for _, width, _ in variants} == {320}
+
+    variants = list(render_variants(make_image((200, 100)), widths=(320, 640)))
+    assert {width for _, width, _ in variants} == {200}
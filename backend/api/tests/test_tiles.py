@@ -0,0 +1,32 @@
+import pytest
+from django.conf import settings
+from django.contrib.gis.geos import Point
+
+from api.tiles import lonlat_to_tile, tile_bbox, tile_to_lonlat, tiles_containing
+
+
+class TestTileMath:
+    def test_lonlat_to_tile(self):
+        x, y = lonlat_to_tile(10, -0.1276474, 51.5073219)
+        assert (int(x), int(y)) == (511, 340)
+
+    def test_tile_to_lonlat_is_inverse(self):
+        assert tile_to_lonlat(10, *lonlat_to_tile(10, -0.1276474, 51.5073219)) == (
+            pytest.approx(-0.1276474),
+            pytest.approx(51.5073219),
+        )
+
+    def test_tile_bbox_includes_buffer(self):
+        west, south, east, north = tile_bbox(10, 511, 340).extent
+        assert west < -0.3515625 < 0 < east
+        assert south < 51.5073219 < north
+
+    def test_tiles_containing(self):
+        tiles = set(tiles_containing(Point(-0.1276474, 51.5073219)))
+        assert not any(z < settings.TILE_MIN_ZOOM for z, x, y in tiles)
+        assert (10, 511, 340) in tiles
+        assert (10, 512, 340) not in tiles
+
+    def test_tiles_containing_point_on_edge(self):
+        tiles = set(tiles_containing(Point(0, 51.5073219)))
+        assert {(10, 511, 340), (10, 512, 340)} <= tiles
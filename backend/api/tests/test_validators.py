@@ -0,0 +1,37 @@
+from unittest import mock
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from api.models import ImageClassification
+from api.validators import is_property_in_image, stub_detect_labels, verdicts
+
+
+@pytest.mark.django_db
+@override_settings(IMAGE_CLASSIFIER="api.validators.stub_detect_labels")
+class TestImageClassification:
+    def setup_method(self):
+        verdicts.clear()
+
+    def test_identical_images_are_classified_once(self):
+        with mock.patch(
+            "api.validators.stub_detect_labels", wraps=stub_detect_labels
+        ) as detect:
+            assert is_property_in_image(SimpleUploadedFile("a.jpg", b"house"))
+            verdicts.clear()
+            assert is_property_in_image(SimpleUploadedFile("b.jpg", b"house"))
+            assert is_property_in_image(SimpleUploadedFile("c.jpg", b"house"))
+        assert detect.call_count == 1
+        classification = ImageClassification.objects.get()
+        assert classification.labels == ["Building"]
+        assert classification.verdict is True
+
+    def test_image_without_property(self):
+        assert not is_property_in_image(SimpleUploadedFile("reject.jpg", b"cat"))
+
+    def test_new_classifier_version_reclassifies(self):
+        is_property_in_image(SimpleUploadedFile("a.jpg", b"house"))
+        with override_settings(IMAGE_CLASSIFIER_VERSION="stub-2"):
+            is_property_in_image(SimpleUploadedFile("a.jpg", b"house"))
+        assert ImageClassification.objects.count() == 2
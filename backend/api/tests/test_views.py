@@ -1,8 +1,20 @@
+import json
+import struct
+from unittest import mock
+
 import pytest
+from asgiref.sync import async_to_sync
 from django.contrib.gis.geos import Point
+from django.core.handlers.asgi import ASGIHandler
+from django.test import AsyncClient, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from model_bakery import baker
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.models import Property
+from api.pagination import KeysetPagination
+from api.tasks import classify_property
 
 
 @pytest.mark.django_db
@@ -12,6 +24,11 @@ class TestPropertyView:
         assert response.status_code == 200
         assert len(response.data["properties"]) == 1
 
+    def test_search_excludes_properties_outside_area(self, client, property):
+        baker.make("api.Property", cordinates=Point(-2.2426305, 53.4807593))
+        response = client.get(reverse("properties-list"), {"address": "London"})
+        assert [p["id"] for p in response.data["properties"]] == [property.id]
+
     def test_search_by_sale_type(self, client):
         baker.make(
             "api.Property",
@@ -93,6 +110,17 @@ class TestPropertyView:
         )
         assert len(response.data["properties"]) == 1
 
+    def test_days_old_window_is_exact(self, client):
+        baker.make(
+            "api.Property",
+            cordinates=Point(-0.1276474, 51.5073219),
+            date=timezone.now() - timezone.timedelta(days=1, minutes=1),
+        )
+        response = client.get(
+            reverse("properties-list"), {"address": "London", "days_old": "1d"}
+        )
+        assert response.data["properties"] == []
+
     def test_search_by_daysold(self, client):
 
         now = timezone.now()
@@ -136,3 +164,539 @@ class TestPropertyView:
 
         response = client.get(reverse("properties-list"), {"address": "London"})
         assert len(response.data["properties"]) == 6
+
+    def test_search_pagination(self, client):
+        now = timezone.now()
+        properties = [
+            baker.make(
+                "api.Property",
+                cordinates=Point(-0.1276474, 51.5073219),
+                date=now - timezone.timedelta(days=days),
+            )
+            for days in (0, 1, 1, 2)
+        ]
+        response = client.get(
+            reverse("properties-list"), {"address": "London", "page_size": "3"}
+        )
+        ids = [p["id"] for p in response.data["properties"]]
+        assert "cordinates" in response.data
+        assert response.data["next"]
+
+        response = client.get(response.data["next"])
+        ids += [p["id"] for p in response.data["properties"]]
+        assert "cordinates" not in response.data
+        assert response.data["next"] is None
+        assert ids == [
+            p.id for p in sorted(properties, key=lambda p: (p.date, p.id), reverse=True)
+        ]
+
+    def test_search_with_invalid_cursor(self, client):
+        response = client.get(
+            reverse("properties-list"), {"address": "London", "cursor": "abc"}
+        )
+        assert response.status_code == 404
+
+    def test_search_ndjson_export(self, client):
+        baker.make(
+            "api.Property", cordinates=Point(-0.1276474, 51.5073219), _quantity=3
+        )
+        response = client.get(
+            reverse("properties-list"),
+            {"address": "London", "format": "ndjson", "page_size": "1"},
+        )
+        assert response.status_code == 200
+        assert response.streaming
+        assert response["Content-Type"] == "application/x-ndjson"
+        lines = b"".join(response.streaming_content).splitlines()
+        assert len(lines) == 3
+        assert {"id", "price", "cordinates"} <= json.loads(lines[0]).keys()
+
+    # Outside a transaction, the router sends reads in one to default
+    @pytest.mark.django_db(transaction=True)
+    def test_search_ndjson_export_reads_from_replica(self, client, settings):
+        settings.DATABASE_REPLICAS = ["replica_0"]
+        baker.make("api.Property", cordinates=Point(-0.1276474, 51.5073219))
+        # Unhealthy, so the rows still come from default
+        with mock.patch("backend.routers.is_healthy", return_value=False) as healthy:
+            response = client.get(
+                reverse("properties-list"),
+                {"lat": 51.5073219, "lon": -0.12, "radius": 2000, "format": "ndjson"},
+            )
+            lines = b"".join(response.streaming_content).splitlines()
+        assert len(lines) == 1
+        healthy.assert_called_with("replica_0")
+
+    def test_search_columnar(self, client, settings):
+        settings.COLUMNAR_MAX_ROWS = 2
+        properties = baker.make(
+            "api.Property", cordinates=Point(-0.1276474, 51.5073219), _quantity=3
+        )
+        response = client.get(
+            reverse("properties-list"), {"address": "London", "format": "columnar"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 2
+        assert data["truncated"]
+        assert set(data["id"]) < {p.id for p in properties}
+        assert data["lon"] == [-0.1276474] * 2
+        assert len(data["sale_type"]) == 2
+
+    def test_search_packed(self, client):
+        property = baker.make(
+            "api.Property",
+            cordinates=Point(-0.1276474, 51.5073219),
+            sale_type=Property.SaleTypes.TO_RENT,
+        )
+        response = client.get(
+            reverse("properties-list"), {"address": "London", "format": "packed"}
+        )
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/octet-stream"
+        values = struct.unpack("<IIiffiii", response.content)
+        assert values[:3] == (1, 0, property.id)
+        assert values[3:5] == pytest.approx((-0.1276474, 51.5073219), abs=1e-5)
+        assert values[5:] == (
+            property.price,
+            property.bedrooms,
+            Property.SaleTypes.values.index(Property.SaleTypes.TO_RENT),
+        )
+
+    def test_search_with_invalid_filter(self, client):
+        response = client.get(
+            reverse("properties-list"), {"address": "London", "price_min": "cheap"}
+        )
+        assert response.status_code == 400
+        assert "price_min" in response.data
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAsyncPropertySearch:
+    def test_search_by_address(self, property):
+        response = async_to_sync(AsyncClient().get)(
+            reverse("properties-search"), {"address": "London", "sale_type": "x"}
+        )
+        assert response.status_code == 200
+        assert response.json()["properties"] == []
+
+        response = async_to_sync(AsyncClient().get)(
+            reverse("properties-search"), {"address": "London"}
+        )
+        data = response.json()
+        assert [p["id"] for p in data["properties"]] == [property.id]
+        assert "POLYGON" in data["cordinates"]
+
+    def test_search_with_invalid_filter(self):
+        response = async_to_sync(AsyncClient().get)(
+            reverse("properties-search"), {"address": "London", "price_max": "x"}
+        )
+        assert response.status_code == 400
+        assert "price_max" in response.json()
+
+    def test_search_matches_list(self, client, property):
+        params = {"lat": 51.5073219, "lon": -0.12, "radius": 2000}
+        expected = client.get(reverse("properties-list"), params).json()
+        response = async_to_sync(AsyncClient().get)(
+            reverse("properties-search"), params
+        )
+        assert response.json() == expected
+
+        etag = response["ETag"]
+        response = async_to_sync(AsyncClient().get)(
+            reverse("properties-search"), params, HTTP_IF_NONE_MATCH=etag
+        )
+        assert response.status_code == 304
+
+    def test_search_columnar(self, property):
+        response = async_to_sync(AsyncClient().get)(
+            reverse("properties-search"),
+            {"lat": 51.5073219, "lon": -0.12, "radius": 2000, "format": "columnar"},
+        )
+        assert response.json()["count"] == 1
+
+
+async def asgi_get(path, query_string=""):
+    """Messages sent by Django's ASGI handler, like a server would get them"""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": query_string.encode(),
+        "headers": [],
+    }
+    await ASGIHandler()(scope, receive, send)
+    return messages
+
+
+@pytest.mark.django_db(transaction=True)
+def test_ndjson_export_over_asgi_is_not_acceptable():
+    baker.make("api.Property", cordinates=Point(-0.1276474, 51.5073219))
+    messages = async_to_sync(asgi_get)(
+        reverse("properties-list"),
+        "lat=51.5073219&lon=-0.12&radius=2000&format=ndjson",
+    )
+    assert messages[0]["status"] == 406
+
+
+@pytest.mark.django_db
+class TestPropertyReview:
+    def test_unpublished_properties_are_hidden(self, client, property):
+        for status in ("pending_review", "rejected"):
+            baker.make(
+                "api.Property", cordinates=Point(-0.1276474, 51.5073219), status=status
+            )
+        response = client.get(reverse("properties-list"), {"address": "London"})
+        assert [p["id"] for p in response.data["properties"]] == [property.id]
+
+    def test_classify_property(self):
+        published, rejected = [
+            baker.make("api.Property", status="pending_review", thumbnail=name)
+            for name in ("house.jpg", "reject.jpg")
+        ]
+        with mock.patch(
+            "api.tasks.is_property_in_image", lambda img: "reject" not in img.name
+        ):
+            classify_property(published.id)
+            classify_property(rejected.id)
+        published.refresh_from_db()
+        rejected.refresh_from_db()
+        assert published.status == "published"
+        assert rejected.status == "rejected"
+
+    def test_unreadable_thumbnail_is_rejected(self):
+        property = baker.make("api.Property", status="pending_review")
+        with mock.patch(
+            "api.tasks.is_property_in_image", side_effect=FileNotFoundError
+        ):
+            classify_property(property.id)
+        property.refresh_from_db()
+        assert property.status == "rejected"
+
+    def test_review_status(self, client, agent, auth_headers):
+        property = baker.make("api.Property", agent=agent, status="pending_review")
+        url = reverse("properties-review-status", args=[property.id])
+        response = client.get(url, **auth_headers)
+        assert response.status_code == 200
+        assert response.data == {"id": property.id, "status": "pending_review"}
+
+    def test_review_status_of_other_agency_is_hidden(self, client, auth_headers):
+        property = baker.make("api.Property", status="pending_review")
+        url = reverse("properties-review-status", args=[property.id])
+        assert client.get(url, **auth_headers).status_code == 404
+
+    def test_unpublished_property_is_shown_only_to_agency(
+        self, client, agent, auth_headers
+    ):
+        property = baker.make("api.Property", agent=agent, status="rejected")
+        url = reverse("properties-detail", args=[property.id])
+        assert client.get(url).status_code == 404
+        response = client.get(url, **auth_headers)
+        assert response.status_code == 200
+        assert "private" in response["Cache-Control"]
+
+
+@pytest.mark.django_db
+class TestPropertyClusters:
+    def test_clusters(self, client):
+        for price in (1000, 2000):
+            baker.make(
+                "api.Property", cordinates=Point(-0.1276474, 51.5073219), price=price
+            )
+        baker.make("api.Property", cordinates=Point(-2.2426305, 53.4807593))
+        response = client.get(
+            reverse("properties-clusters"), {"bbox": "-8,49,2,59", "zoom": "5"}
+        )
+        assert response.status_code == 200
+        clusters = sorted(response.data["clusters"], key=lambda c: -c["count"])
+        assert [c["count"] for c in clusters] == [2, 1]
+        assert clusters[0]["price_min"] == 1000
+        assert clusters[0]["price_max"] == 2000
+        assert clusters[0]["center"] == pytest.approx([-0.1276474, 51.5073219])
+
+    def test_clusters_with_invalid_bbox(self, client):
+        response = client.get(
+            reverse("properties-clusters"), {"bbox": "2,49,-8,59", "zoom": "5"}
+        )
+        assert response.status_code == 400
+        response = client.get(
+            reverse("properties-clusters"), {"bbox": "-180,-90,180,90", "zoom": "18"}
+        )
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestPropertyTiles:
+    def test_tile(self, client, property):
+        response = client.get(reverse("property-tile", args=[10, 511, 340]))
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/vnd.mapbox-vector-tile"
+        assert len(response.content) > 0
+
+    def test_tile_without_properties(self, client, property):
+        response = client.get(reverse("property-tile", args=[10, 0, 0]))
+        assert response.status_code == 200
+        assert response.content == b""
+
+    def test_tile_is_filtered(self, client, property):
+        response = client.get(
+            reverse("property-tile", args=[10, 511, 340]),
+            {"price_min": property.price + 1},
+        )
+        assert response.content == b""
+
+    def test_invalid_tile(self, client):
+        response = client.get(reverse("property-tile", args=[10, 1024, 0]))
+        assert response.status_code == 404
+        response = client.get(reverse("property-tile", args=[1, 0, 0]))
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestNearSearch:
+    @pytest.fixture
+    def properties(self):
+        return [
+            baker.make("api.Property", cordinates=Point(lon, lat))
+            for lon, lat in (
+                (-0.1276474, 51.5073219),
+                (-0.1406474, 51.5073219),
+                (-2.2426305, 53.4807593),
+            )
+        ]
+
+    def search(self, client, **params):
+        return client.get(
+            reverse("properties-list"), {"lat": 51.5073219, "lon": -0.12, **params}
+        )
+
+    def test_search_within_radius(self, client, properties):
+        response = self.search(client, radius=2000)
+        assert {p["id"] for p in response.data["properties"]} == {
+            properties[0].id,
+            properties[1].id,
+        }
+        assert "cordinates" not in response.data
+
+    def test_search_nearest(self, client, properties):
+        response = self.search(client, sort="distance", page_size=2)
+        assert [p["id"] for p in response.data["properties"]] == [
+            properties[0].id,
+            properties[1].id,
+        ]
+        response = client.get(response.data["next"])
+        assert [p["id"] for p in response.data["properties"]] == [properties[2].id]
+
+    def test_search_nearest_with_filters(self, client, properties):
+        response = self.search(
+            client, sort="distance", radius=2000, price_min=properties[1].price
+        )
+        ids = [p["id"] for p in response.data["properties"]]
+        assert properties[1].id in ids
+        assert properties[2].id not in ids
+
+    def test_search_with_invalid_params(self, client):
+        assert self.search(client).status_code == 400
+        assert self.search(client, radius="far").status_code == 400
+        assert self.search(client, radius=10**9).status_code == 400
+        assert self.search(client, sort="price").status_code == 400
+        response = client.get(reverse("properties-list"), {"lat": 51.5})
+        assert response.status_code == 400
+
+    def test_address_search_validates_sort(self, client):
+        for sort in ("distance", "price"):
+            response = client.get(
+                reverse("properties-list"), {"address": "London", "sort": sort}
+            )
+            assert response.status_code == 400
+            assert "sort" in response.data
+
+
+@pytest.mark.django_db
+class TestTextSearch:
+    @pytest.fixture
+    def properties(self):
+        return [
+            baker.make(
+                "api.Property",
+                cordinates=Point(-0.1276474, 51.5073219),
+                title=title,
+                description=description,
+                key_features=key_features,
+            )
+            for title, description, key_features in (
+                ("Flat with a garden", "Close to the station", ["Parking"]),
+                ("Detached house", "Large garden at the back", ["Double garage"]),
+                ("Studio", "Newly renovated", ["Gardens nearby"]),
+            )
+        ]
+
+    def search(self, client, **params):
+        return client.get(
+            reverse("properties-list"),
+            {"lat": 51.5073219, "lon": -0.12, "radius": 2000, **params},
+        )
+
+    def test_search_words(self, client, properties):
+        response = self.search(client, q="garden")
+        assert {p["id"] for p in response.data["properties"]} == {
+            p.id for p in properties
+        }
+        response = self.search(client, q="garage")
+        assert [p["id"] for p in response.data["properties"]] == [properties[1].id]
+        response = self.search(client, q="garden -flat")
+        assert properties[0].id not in {p["id"] for p in response.data["properties"]}
+
+    def test_search_by_relevance(self, client, properties):
+        response = self.search(client, q="garden", sort="relevance", page_size=1)
+        # Words in the title rank higher than in key features or description
+        assert [p["id"] for p in response.data["properties"]] == [properties[0].id]
+        ids = [properties[0].id]
+        while link := response.data["next"]:
+            response = client.get(link)
+            ids += [p["id"] for p in response.data["properties"]]
+        assert sorted(ids) == sorted(p.id for p in properties)
+
+    def test_search_follows_updates(self, client, properties):
+        properties[2].key_features = ["Balcony"]
+        properties[2].save()
+        response = self.search(client, q="balcony")
+        assert [p["id"] for p in response.data["properties"]] == [properties[2].id]
+
+    def test_search_with_other_filters(self, client, properties):
+        response = self.search(
+            client, q="garden", price_min=properties[1].price, sort="relevance"
+        )
+        ids = {p["id"] for p in response.data["properties"]}
+        assert properties[1].id in ids
+        assert all(
+            p["price"] >= properties[1].price for p in response.data["properties"]
+        )
+
+    def test_relevance_requires_query(self, client):
+        assert self.search(client, sort="relevance").status_code == 400
+
+
+@pytest.mark.django_db
+class TestConditionalRequests:
+    def test_property_not_modified(self, client, property):
+        url = reverse("properties-detail", args=[property.id])
+        response = client.get(url)
+        assert response.status_code == 200
+        assert "s-maxage=" in response["Cache-Control"]
+        assert "Last-Modified" in response
+
+        etag = response["ETag"]
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        property.price += 1
+        property.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_near_search_not_modified(
+        self, client, property, django_capture_on_commit_callbacks
+    ):
+        params = {"lat": 51.5073219, "lon": -0.12, "radius": 2000}
+        etag = client.get(reverse("properties-list"), params)["ETag"]
+        with mock.patch.object(KeysetPagination, "paginate_queryset") as paginate:
+            response = client.get(
+                reverse("properties-list"), params, HTTP_IF_NONE_MATCH=etag
+            )
+        assert response.status_code == 304
+        paginate.assert_not_called()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            baker.make("api.Property", cordinates=Point(-0.1276474, 51.5073219))
+        response = client.get(
+            reverse("properties-list"), params, HTTP_IF_NONE_MATCH=etag
+        )
+        assert response.status_code == 200
+        assert len(response.data["properties"]) == 2
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_address_search_not_modified(
+        self, client, property, django_capture_on_commit_callbacks
+    ):
+        params = {"address": "London"}
+        etag = client.get(reverse("properties-list"), params)["ETag"]
+        with mock.patch.object(KeysetPagination, "paginate_queryset") as paginate:
+            response = client.get(
+                reverse("properties-list"), params, HTTP_IF_NONE_MATCH=etag
+            )
+        assert response.status_code == 304
+        paginate.assert_not_called()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            baker.make("api.Property", cordinates=Point(-0.1276474, 51.5073219))
+        response = client.get(
+            reverse("properties-list"), params, HTTP_IF_NONE_MATCH=etag
+        )
+        assert response.status_code == 200
+        assert len(response.data["properties"]) == 2
+
+    def test_days_old_window_is_part_of_etag(self, client, property):
+        params = {"address": "London", "days_old": "1d"}
+        etag = client.get(reverse("properties-list"), params)["ETag"]
+        next_hour = timezone.now() + timezone.timedelta(hours=1)
+        with mock.patch("django.utils.timezone.now", return_value=next_hour):
+            response = client.get(
+                reverse("properties-list"), params, HTTP_IF_NONE_MATCH=etag
+            )
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+
+@pytest.mark.django_db
+class TestPropertyOwnership:
+    def test_agency_users_can_delete(self, client, agent):
+        colleague = baker.make("users.CustomUser", real_estate_agency=agent)
+        property = baker.make("api.Property", agent=agent)
+        token = RefreshToken.for_user(colleague).access_token
+        response = client.delete(
+            reverse("properties-detail", args=[property.id]),
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+        assert response.status_code == 204
+
+    def test_other_agency_cant_delete(self, client, auth_headers):
+        property = baker.make("api.Property")
+        response = client.delete(
+            reverse("properties-detail", args=[property.id]), **auth_headers
+        )
+        assert response.status_code == 400
+        assert Property.objects.filter(id=property.id).exists()
+
+    def test_ownership_is_checked_in_one_query(
+        self, agent, agent_user, django_assert_num_queries
+    ):
+        property = baker.make("api.Property", agent=agent)
+        with django_assert_num_queries(1):
+            assert (
+                Property.objects.with_is_owner(agent_user).get(id=property.id).is_owner
+            )
+
+    def test_dashboard(self, client, agent, auth_headers):
+        baker.make("api.Property", agent=agent, sale_type="for_sale", price=1000)
+        baker.make("api.Property", agent=agent, sale_type="for_sale", price=3000)
+        baker.make(
+            "api.Property", agent=agent, sale_type="to_rent", status="pending_review"
+        )
+        baker.make("api.Property")
+        response = client.get(reverse("properties-dashboard"), **auth_headers)
+        assert response.status_code == 200
+        assert len(response.data["properties"]) == 3
+        stats = response.data["stats"]
+        assert stats["count"] == 3
+        assert stats["sale_types"]["for_sale"] == {"count": 2, "average_price": 2000}
+        assert stats["sale_types"]["to_rent"]["count"] == 1
+        assert stats["statuses"]["pending_review"] == 1
@@ -0,0 +1,55 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def available_formats():
+    """Pillow built without libwebp can only write JPEG variants"""
+    Image.init()
+    return {
+        name: (format, options)
+        for name, (format, options) in FORMATS.items()
+        if format in Image.SAVE
+    }
+
+
+def render_variants(file, widths=None):
+    """
+    Yield (format, width, bytes) of every variant, largest first. JPEGs are
+    decoded at reduced scale and each size is resized from the previous one,
+    so only one decoded image is held in memory.
+    """
+    widths = sorted(widths or settings.THUMBNAIL_WIDTHS, reverse=True)
+    image = Image.open(file)
+    image.draft("RGB", (widths[0], widths[0]))
+    image = ImageOps.exif_transpose(image).convert("RGB")
+
+    formats = available_formats()
+    widths = [width for width in widths if width < image.width] or [image.width]
+    for width in widths:
+        image.thumbnail((width, image.height), Image.LANCZOS)
+        for name, (format, options) in formats.items():
+            buffer = BytesIO()
+            image.save(buffer, format, **options)
+            yield name, width, buffer.getvalue()
+
+
+def generate_variants(thumbnail):
+    """Store variants next to the original, returns {format: {width: name}}"""
+    stem = os.path.splitext(thumbnail.name)[0]
+    variants = {}
+    with thumbnail.open("rb"):
+        for format, width, content in render_variants(thumbnail):
+            name = thumbnail.storage.save(
+                f"variants/{stem}_{width}.{format}", ContentFile(content)
+            )
+            variants.setdefault(format, {})[str(width)] = name
+    return variants
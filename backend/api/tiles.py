@@ -0,0 +1,163 @@
+import math
+import time
+
+from django.conf import settings
+from django.contrib.gis.geos import Polygon
+from django.db import connections, router
+from redis import RedisError
+
+from backend import metrics
+from backend.routers import reads_after
+from helpers import get_redis
+
+from .filters import filter_properties, filters_key
+from .models import Property
+
+MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+LAYER = "properties"
+# Tile coordinate space and the margin around it, points in the margin are
+# repeated in neighbouring tiles so markers on the edge aren't cut off
+EXTENT = 4096
+BUFFER = 64
+# Web Mercator doesn't reach the poles
+MAX_LATITUDE = 85.0511287798066
+
+TILE_SQL = f"""
+    WITH rows AS (
+        SELECT
+            ST_AsMVTGeom(
+                ST_Transform(property.cordinates, 3857),
+                ST_TileEnvelope(%s, %s, %s),
+                {EXTENT},
+                {BUFFER}
+            ) AS geom,
+            property.id,
+            property.price,
+            property.sale_type,
+            property.property_type,
+            property.bedrooms
+        FROM ({{}}) property
+    )
+    SELECT ST_AsMVT(rows, '{LAYER}', {EXTENT}, 'geom') FROM rows
+"""
+
+
+def tile_to_lonlat(z, x, y):
+    """North west corner of a tile, x and y may be fractional"""
+    n = 2**z
+    lon = x / n * 360 - 180
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    return lon, lat
+
+
+def lonlat_to_tile(z, lon, lat):
+    """Fractional tile coordinates of a point"""
+    n = 2**z
+    lat = math.radians(max(min(lat, MAX_LATITUDE), -MAX_LATITUDE))
+    x = (lon + 180) / 360 * n
+    y = (1 - math.asinh(math.tan(lat)) / math.pi) / 2 * n
+    return x, y
+
+
+def tile_bbox(z, x, y):
+    """Tile bounds including the buffer as a lon/lat Polygon"""
+    margin = BUFFER / EXTENT
+    west, north = tile_to_lonlat(z, x - margin, y - margin)
+    east, south = tile_to_lonlat(z, x + 1 + margin, y + 1 + margin)
+    return Polygon.from_bbox((west, south, east, north))
+
+
+def tiles_containing(point):
+    """(z, x, y) of every tile from TILE_MIN_ZOOM that has point in its buffer"""
+    margin = BUFFER / EXTENT
+    for z in range(settings.TILE_MIN_ZOOM, settings.MAP_MAX_ZOOM + 1):
+        fx, fy = lonlat_to_tile(z, point.x, point.y)
+        for x in tile_span(fx, margin, z):
+            for y in tile_span(fy, margin, z):
+                yield z, x, y
+
+
+def tile_span(value, margin, z):
+    first = max(math.floor(value - margin), 0)
+    last = min(math.floor(value + margin), 2**z - 1)
+    return range(first, last + 1)
+
+
+def is_valid_tile(z, x, y):
+    return (
+        settings.TILE_MIN_ZOOM <= z <= settings.MAP_MAX_ZOOM
+        and 0 <= x < 2**z
+        and 0 <= y < 2**z
+    )
+
+
+def render_tile(z, x, y, params):
+    """Published properties matching the list filters as a MVT tile"""
+    query = filter_properties(
+        Property.objects.published().filter(cordinates__bboverlaps=tile_bbox(z, x, y)),
+        params,
+    ).values("id", "cordinates", "price", "sale_type", "property_type", "bedrooms")
+    # Tiles with more properties than TILE_MAX_FEATURES show the newest ones
+    query = query.order_by("-date", "-id")[: settings.TILE_MAX_FEATURES]
+    sql, query_params = query.query.sql_with_params()
+    # Raw SQL isn't routed, use the connection the ORM would read from
+    with connections[router.db_for_read(Property)].cursor() as cursor:
+        cursor.execute(TILE_SQL.format(sql), (z, x, y, *query_params))
+        tile = cursor.fetchone()[0]
+    return bytes(tile) if tile is not None else b""
+
+
+class TileCache:
+    """
+    Rendered tiles in Redis keyed by z/x/y, filters and the tile generation.
+    Changing a property gives the tiles around it a new generation, so tiles
+    rendered before the change are never read again and expire.
+    """
+
+    generation_prefix = "tile-generation:"
+    key_prefix = "tile:"
+
+    def get_generation_key(self, z, x, y):
+        return f"{self.generation_prefix}{z}/{x}/{y}"
+
+    def get_generation(self, z, x, y):
+        generation = get_redis().get(self.get_generation_key(z, x, y))
+        return generation.decode() if generation is not None else "0"
+
+    def get_or_render(self, z, x, y, params):
+        try:
+            generation = self.get_generation(z, x, y)
+            key = f"{self.key_prefix}{z}/{x}/{y}:{generation}:{filters_key(params)}"
+            tile = get_redis().get(key)
+        except RedisError:
+            key = tile = None
+        metrics.incr("tiles.hits" if tile is not None else "tiles.misses")
+        if tile is None:
+            # Tiles cached under a new generation have to include the change
+            with reads_after(generation if key is not None else None):
+                tile = render_tile(z, x, y, params)
+            if key is not None:
+                try:
+                    get_redis().setex(key, settings.TILE_CACHE_TTL, tile)
+                except RedisError:
+                    pass
+        return tile
+
+    def invalidate(self, points):
+        # Generations are unique and outlive the tiles cached under them, so an
+        # expired generation can't bring back an old tile
+        generation = time.time_ns()
+        try:
+            with get_redis().pipeline(transaction=False) as pipe:
+                for tile in {t for point in points for t in tiles_containing(point)}:
+                    pipe.setex(
+                        self.get_generation_key(*tile),
+                        settings.TILE_CACHE_TTL * 2,
+                        generation,
+                    )
+                pipe.execute()
+        except RedisError:
+            pass
+
+
+cache = TileCache()
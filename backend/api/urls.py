@@ -1,9 +1,14 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 
-from .views import PropertyViewSet
+from .views import PropertyViewSet, property_search, property_tile
 
 router = DefaultRouter()
 
 router.register("properties", PropertyViewSet, basename="properties")
 
-urlpatterns = router.urls
+urlpatterns = [
+    path("properties/search/", property_search, name="properties-search"),
+    path("tiles/<int:z>/<int:x>/<int:y>.mvt", property_tile, name="property-tile"),
+    *router.urls,
+]
@@ -1,16 +1,62 @@
-import boto3
+import hashlib
+
 from django.conf import settings
+from django.utils.module_loading import import_string
+
+from backend import metrics
+from backend.outbound import get_boto3_client
+from helpers import LRUCache
+
+from .models import ImageClassification
+
+BUILDING_LABEL = "Building"
+
+verdicts = LRUCache(maxsize=settings.IMAGE_CLASSIFICATION_CACHE_MAXSIZE, ttl=60 * 60)
+
+
+def detect_labels(img):
+    client = get_boto3_client("rekognition")
+    response = client.detect_labels(Image={"Bytes": img.read()}, MaxLabels=10)
+    return [label.get("Name") for label in response.get("Labels", [])]
+
+
+def stub_detect_labels(img):
+    """Offline stand-in for detect_labels, files named *reject* have no building"""
+    return [] if "reject" in img.name else [BUILDING_LABEL]
+
+
+def hash_file(img):
+    digest = hashlib.sha256()
+    for chunk in img.chunks():
+        digest.update(chunk)
+    img.seek(0)
+    return digest.hexdigest()
 
 
 def is_property_in_image(img):
-    client = boto3.client(
-        "rekognition",
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        region_name=settings.AWS_REGION_NAME,
-    )
-    response = client.detect_labels(Image={"Bytes": img.file.read()}, MaxLabels=10)
-    has_property = any(
-        [label.get("Name") == "Building" for label in response.get("Labels", {})]
-    )
-    return has_property
+    """
+    Identical images are classified once per classifier version, results are
+    kept in ImageClassification with the most recent verdicts cached in memory
+    """
+    digest = hash_file(img)
+    version = settings.IMAGE_CLASSIFIER_VERSION
+    key = f"{digest}:{version}"
+    if (verdict := verdicts.get(key)) is None:
+        verdict = (
+            ImageClassification.objects.filter(hash=digest, model_version=version)
+            .values_list("verdict", flat=True)
+            .first()
+        )
+    if verdict is not None:
+        metrics.incr("image_classification.hits")
+    else:
+        metrics.incr("image_classification.misses")
+        labels = import_string(settings.IMAGE_CLASSIFIER)(img)
+        classification, _ = ImageClassification.objects.get_or_create(
+            hash=digest,
+            model_version=version,
+            defaults={"labels": labels, "verdict": BUILDING_LABEL in labels},
+        )
+        verdict = classification.verdict
+    verdicts.set(key, verdict)
+    return verdict
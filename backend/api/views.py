@@ -1,17 +1,73 @@
-import requests
+import codecs
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
+from django.db import router
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
 from django.utils.decorators import method_decorator
 from drf_yasg import openapi
 from drf_yasg.inspectors import SwaggerAutoSchema
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status, viewsets
-from rest_framework.exceptions import ParseError
+from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import (
+    APIException,
+    NotAcceptable,
+    NotFound,
+    ParseError,
+)
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from backend.routers import reads_after, use_replica
+from helpers import database_sync_to_async
 
+from . import columnar, conditional, search_cache, tiles
+from .filters import PROPERTY_SEARCH, PropertyFilterBackend
+from .geocoding import geocode, geocode_async
+from .ingest import import_properties
 from .models import Property
-from .serializers import PropertySerializer
+from .pagination import KeysetPagination
+from .renderers import ColumnarRenderer, NDJSONRenderer, PackedRenderer, encode_lines
+from .serializers import PropertyListSerializer, PropertySerializer
+from .spatial import (
+    cluster_properties,
+    filter_in_area,
+    filter_near,
+    parse_bbox,
+    parse_near,
+    parse_zoom,
+)
+
+PROPERTY_FILTER_PARAMETERS = [
+    openapi.Parameter(
+        "sale_type",
+        openapi.IN_QUERY,
+        type=openapi.TYPE_STRING,
+        enum=Property.SaleTypes.values,
+    ),
+    openapi.Parameter("property_type", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+    openapi.Parameter("price_min", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+    openapi.Parameter("price_max", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+    openapi.Parameter("bedrooms_min", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+    openapi.Parameter("bedrooms_max", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+    openapi.Parameter("bathrooms_min", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+    openapi.Parameter("bathrooms_max", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+    openapi.Parameter(
+        "days_old",
+        openapi.IN_QUERY,
+        type=openapi.TYPE_STRING,
+        enum=["1d", "3d", "7d", "14d", "30d"],
+    ),
+    openapi.Parameter(
+        "q",
+        openapi.IN_QUERY,
+        type=openapi.TYPE_STRING,
+        description='Title, description or key features, e.g. garden -flat "garage"',
+    ),
+]
 
 
 class PropertyViewSetSchemaCreate(SwaggerAutoSchema):
@@ -43,56 +99,190 @@ class PropertyViewSetSchemaDestroy(SwaggerAutoSchema):
         ]
 
 
+class PropertyViewSetSchemaBulk(PropertyViewSetSchemaDestroy):
+    def get_consumes(self):
+        return [NDJSONRenderer.media_type, "text/csv"]
+
+    def get_request_body_parameters(self, consumes):
+        return [
+            openapi.Parameter(
+                "Feed",
+                openapi.IN_BODY,
+                required=True,
+                schema=openapi.Schema(
+                    "One property per line, rows are upserted on external_id",
+                    type=openapi.TYPE_STRING,
+                ),
+            )
+        ]
+
+
 class PropertyViewSetSchemaList(SwaggerAutoSchema):
     def add_manual_parameters(self, parameters):
         return [
             openapi.Parameter(
-                "address", openapi.IN_QUERY, required=True, type=openapi.TYPE_STRING
-            ),
-            openapi.Parameter(
-                "sale_type",
+                "address",
                 openapi.IN_QUERY,
                 type=openapi.TYPE_STRING,
-                enum=Property.SaleTypes.values,
+                description="Required unless searching around lat and lon",
             ),
+            openapi.Parameter("lat", openapi.IN_QUERY, type=openapi.TYPE_NUMBER),
+            openapi.Parameter("lon", openapi.IN_QUERY, type=openapi.TYPE_NUMBER),
             openapi.Parameter(
-                "property_type", openapi.IN_QUERY, type=openapi.TYPE_STRING
+                "radius",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_NUMBER,
+                description="Metres around lat and lon",
             ),
-            openapi.Parameter("price_min", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
-            openapi.Parameter("price_max", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
             openapi.Parameter(
-                "bedrooms_min", openapi.IN_QUERY, type=openapi.TYPE_INTEGER
+                "sort",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                enum=["date", "distance", "relevance"],
+                description="distance sorts nearest first, lat and lon only, "
+                "relevance sorts best matches of q first",
             ),
+            *PROPERTY_FILTER_PARAMETERS,
+            openapi.Parameter("cursor", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter("page_size", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
             openapi.Parameter(
-                "bedrooms_max", openapi.IN_QUERY, type=openapi.TYPE_INTEGER
+                "format",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                enum=["json", "ndjson", "columnar", "packed"],
+                description="ndjson streams every match, one property per line. "
+                "columnar and packed return id, lon, lat, price, bedrooms and "
+                "sale_type of up to COLUMNAR_MAX_ROWS matches as parallel JSON "
+                "arrays or a binary buffer of int32 and float32 columns",
             ),
+        ]
+
+    def get_response_serializers(self):
+        return {
+            "200": openapi.Response(
+                "Get properties and cordinates from address",
+                openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "next": openapi.Schema(
+                            "URL of the next page", type=openapi.TYPE_STRING
+                        ),
+                        "properties": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=self.serializer_to_schema(PropertySerializer({})),
+                        ),
+                        "cordinates": openapi.Schema(
+                            "WKT - POLYGON, only on the first page of address searches",
+                            type=openapi.TYPE_STRING,
+                        ),
+                    },
+                ),
+            )
+        }
+
+
+class PropertyViewSetSchemaClusters(SwaggerAutoSchema):
+    def add_manual_parameters(self, parameters):
+        return [
             openapi.Parameter(
-                "bathrooms_min", openapi.IN_QUERY, type=openapi.TYPE_INTEGER
+                "bbox",
+                openapi.IN_QUERY,
+                required=True,
+                type=openapi.TYPE_STRING,
+                description="min_lon,min_lat,max_lon,max_lat",
             ),
             openapi.Parameter(
-                "bathrooms_max", openapi.IN_QUERY, type=openapi.TYPE_INTEGER
+                "zoom", openapi.IN_QUERY, required=True, type=openapi.TYPE_INTEGER
             ),
+            *PROPERTY_FILTER_PARAMETERS,
+        ]
+
+    def get_response_serializers(self):
+        cluster = openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                "count": openapi.Schema(type=openapi.TYPE_INTEGER),
+                "center": openapi.Schema(
+                    "[lon, lat]",
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(type=openapi.TYPE_NUMBER),
+                ),
+                "price_min": openapi.Schema(type=openapi.TYPE_INTEGER),
+                "price_max": openapi.Schema(type=openapi.TYPE_INTEGER),
+            },
+        )
+        return {
+            "200": openapi.Response(
+                "Properties in bbox grouped into clusters",
+                openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "clusters": openapi.Schema(
+                            type=openapi.TYPE_ARRAY, items=cluster
+                        )
+                    },
+                ),
+            )
+        }
+
+
+class PropertyViewSetSchemaDashboard(PropertyViewSetSchemaDestroy):
+    def add_manual_parameters(self, parameters):
+        return [
+            *super().add_manual_parameters(parameters),
+            *PROPERTY_FILTER_PARAMETERS,
             openapi.Parameter(
-                "days_old",
+                "sort",
                 openapi.IN_QUERY,
                 type=openapi.TYPE_STRING,
-                enum=["1d", "3d", "7d", "14d", "30d"],
+                enum=["date", "relevance"],
+                description="relevance sorts best matches of q first",
             ),
+            openapi.Parameter("cursor", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter("page_size", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
         ]
 
     def get_response_serializers(self):
+        count = openapi.Schema(type=openapi.TYPE_INTEGER)
+        sale_type = openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                "count": count,
+                "average_price": openapi.Schema(type=openapi.TYPE_NUMBER),
+            },
+        )
         return {
             "200": openapi.Response(
-                "Get properties and cordinates from address",
+                "Properties of the user's agency",
                 openapi.Schema(
                     type=openapi.TYPE_OBJECT,
                     properties={
+                        "next": openapi.Schema(
+                            "URL of the next page", type=openapi.TYPE_STRING
+                        ),
                         "properties": openapi.Schema(
                             type=openapi.TYPE_ARRAY,
                             items=self.serializer_to_schema(PropertySerializer({})),
                         ),
-                        "cordinates": openapi.Schema(
-                            "WKT - POLYGON", type=openapi.TYPE_STRING
+                        "stats": openapi.Schema(
+                            "Only on the first page",
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                "count": count,
+                                "sale_types": openapi.Schema(
+                                    type=openapi.TYPE_OBJECT,
+                                    properties={
+                                        value: sale_type
+                                        for value in Property.SaleTypes.values
+                                    },
+                                ),
+                                "statuses": openapi.Schema(
+                                    type=openapi.TYPE_OBJECT,
+                                    properties={
+                                        value: count for value in Property.Status.values
+                                    },
+                                ),
+                            },
                         ),
                     },
                 ),
@@ -103,6 +293,14 @@ class PropertyViewSetSchemaList(SwaggerAutoSchema):
 class PropertyViewSet(viewsets.ModelViewSet):
     queryset = Property.objects.all()
     serializer_class = PropertySerializer
+    pagination_class = KeysetPagination
+    filter_backends = [PropertyFilterBackend]
+    renderer_classes = [
+        *api_settings.DEFAULT_RENDERER_CLASSES,
+        NDJSONRenderer,
+        ColumnarRenderer,
+        PackedRenderer,
+    ]
 
     @swagger_auto_schema(auto_schema=PropertyViewSetSchemaCreate)
     @method_decorator(login_required)
@@ -120,91 +318,219 @@ class PropertyViewSet(viewsets.ModelViewSet):
     @swagger_auto_schema(auto_schema=PropertyViewSetSchemaDestroy)
     @method_decorator(login_required)
     def destroy(self, request, *args, **kwargs):
-        agent = get_object_or_404(Property, id=kwargs.get("pk")).agent
-        if request.user == agent.customuser_set.first():
-            return super().destroy(request, *args, **kwargs)
-        raise ParseError("User isn't in agency that owns this property")
+        return super().destroy(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        property = self.get_object()
+        etag = conditional.make_etag(request, property.modified.isoformat())
+        response = conditional.not_modified(request, etag, property.modified)
+        if response is None:
+            response = Response(self.get_serializer(property).data)
+        # Listings under review are only shown to their agency
+        public = property.status == Property.Status.PUBLISHED
+        return conditional.add_validators(response, etag, property.modified, public)
+
+    def get_object(self):
+        if self.action == "retrieve":
+            return get_object_or_404(
+                self.get_queryset().visible_to(self.request.user), pk=self.kwargs["pk"]
+            )
+        if self.action not in ("update", "partial_update", "destroy"):
+            return super().get_object()
+        # Property and ownership in one query, any user of the agency may edit
+        property = get_object_or_404(
+            self.get_queryset().with_is_owner(self.request.user), pk=self.kwargs["pk"]
+        )
+        if not property.is_owner:
+            raise ParseError("User isn't in agency that owns this property")
+        return property
+
+    @swagger_auto_schema(auto_schema=PropertyViewSetSchemaDashboard)
+    @action(detail=False)
+    @method_decorator(login_required)
+    @use_replica()
+    def dashboard(self, request):
+        """Use this endpoint to list the properties of the user's agency"""
+        if not request.user.real_estate_agency_id:
+            raise ParseError("This user isn't assigned to any agency")
+        query = self.filter_queryset(self.get_queryset().owned_by(request.user))
+        ranked = PROPERTY_SEARCH.order_by_rank(query, request.query_params)
+        page = self.paginate_queryset(PropertyListSerializer.select(ranked))
+        response = self.get_paginated_response(
+            PropertyListSerializer(page, many=True).data
+        )
+        if self.paginator.cursor is None:
+            response.data["stats"] = query.stats()
+        return response
+
+    @swagger_auto_schema(auto_schema=PropertyViewSetSchemaBulk)
+    @action(detail=False, methods=["post"], url_path="bulk")
+    @method_decorator(login_required)
+    def bulk(self, request):
+        """Import a NDJSON or CSV feed of the agency's properties"""
+        agent = request.user.real_estate_agency
+        if not agent:
+            raise ParseError("This user isn't assigned to any agency")
+        format = "csv" if request.content_type.startswith("text/csv") else "ndjson"
+        # Read the body line by line, feeds are too big for request.data
+        lines = codecs.iterdecode(request.stream or [], "utf-8-sig")
+        try:
+            result = import_properties(agent, lines, format)
+        except UnicodeDecodeError:
+            raise ParseError("Feed must be UTF-8 encoded")
+        return Response(result)
+
+    @swagger_auto_schema(auto_schema=PropertyViewSetSchemaClusters)
+    @action(detail=False)
+    @use_replica()
+    def clusters(self, request):
+        """Use this endpoint to draw properties on a zoomed out map"""
+        bbox = parse_bbox(request.query_params.get("bbox"))
+        zoom = parse_zoom(request.query_params.get("zoom"))
+        query = self.filter_queryset(self.get_queryset().published())
+        clusters = [
+            {
+                "count": cluster["count"],
+                "center": [cluster["center"].x, cluster["center"].y],
+                "price_min": cluster["price_min"],
+                "price_max": cluster["price_max"],
+            }
+            for cluster in cluster_properties(query, bbox, zoom)
+        ]
+        return Response({"clusters": clusters})
+
+    @action(detail=True, url_path="status")
+    @method_decorator(login_required)
+    def review_status(self, request, pk=None):
+        """Poll whether an uploaded property of the agency was published"""
+        property = get_object_or_404(
+            Property.objects.owned_by(request.user).only("status"), pk=pk
+        )
+        return Response({"id": property.id, "status": property.status})
 
     @swagger_auto_schema(auto_schema=PropertyViewSetSchemaList)
+    @use_replica()
     def list(self, request):
+        """
+        Use this endpoint to retrieve properties from provided address in UK
+        or around a point
+        """
 
-        """Use this endpoint to retrieve properties from provided address in UK"""
-
-        address = request.query_params.get("address")
-        if not address:
-            return Response(status=status.HTTP_404_NOT_FOUND)
-
-        results = requests.get(
-            f"https://nominatim.openstreetmap.org/search?q={address}"
-            "&format=json&country=United Kingdom&polygon_text=1&limit=3"
-        ).json()
-        is_polygon = False
-        for place in results:
-            geotext = place.get("geotext")
-            if "POLYGON" in geotext:
-                is_polygon = True
-                break
-        if not is_polygon:
-            return Response(status=status.HTTP_404_NOT_FOUND)
-
-        query = Property.objects.filter(cordinates__intersects=geotext)
-
-        sale_type = request.query_params.get("sale_type")
-        if sale_type:
-            query = query.filter(sale_type=sale_type)
-
-        property_type = request.query_params.get("property_type")
-        if property_type:
-            query = query.filter(property_type=property_type)
-
-        price_min = request.query_params.get("price_min")
-        price_max = request.query_params.get("price_max")
-        if price_max and price_min:
-            query = query.filter(price__lte=int(price_max), price__gte=int(price_min))
-        elif price_max:
-            query = query.filter(price__lte=int(price_max))
-        elif price_min:
-            query = query.filter(price__gte=int(price_min))
-
-        bedrooms_min = request.query_params.get("bedrooms_min")
-        bedrooms_max = request.query_params.get("bedrooms_max")
-        if bedrooms_max and bedrooms_min:
-            query = query.filter(
-                bedrooms__lte=int(bedrooms_max), bedrooms__gte=int(bedrooms_min)
-            )
-        elif bedrooms_max:
-            query = query.filter(bedrooms__lte=int(bedrooms_max))
-        elif bedrooms_min:
-            query = query.filter(bedrooms__gte=int(bedrooms_min))
-
-        bathrooms_min = request.query_params.get("bathrooms_min")
-        bathrooms_max = request.query_params.get("bathrooms_max")
-        if bathrooms_max and bathrooms_min:
-            query = query.filter(
-                bathrooms__lte=int(bathrooms_max), bathrooms__gte=int(bathrooms_min)
-            )
-        elif bathrooms_max:
-            query = query.filter(bathrooms__lte=int(bathrooms_max))
-        elif bathrooms_min:
-            query = query.filter(bathrooms__gte=int(bathrooms_min))
-
-        days_old = request.query_params.get("days_old")
-        if days_old == "1d":
-            date = timezone.now() - timezone.timedelta(days=1)
-            query = query.filter(date__gt=date)
-        elif days_old == "3d":
-            date = timezone.now() - timezone.timedelta(days=3)
-            query = query.filter(date__gt=date)
-        elif days_old == "7d":
-            date = timezone.now() - timezone.timedelta(days=7)
-            query = query.filter(date__gt=date)
-        elif days_old == "14d":
-            date = timezone.now() - timezone.timedelta(days=14)
-            query = query.filter(date__gt=date)
-        elif days_old == "30d":
-            date = timezone.now() - timezone.timedelta(days=30)
-            query = query.filter(date__gt=date)
-
-        serializer = PropertySerializer(query, many=True)
-        ctx = {"properties": serializer.data, "cordinates": geotext}
-        return Response(ctx, status=status.HTTP_200_OK)
+        if (near := parse_near(request.query_params)) is None:
+            address = request.query_params.get("address")
+            if not address:
+                return Response(status=status.HTTP_404_NOT_FOUND)
+
+            geotext = geocode(address)
+            if not geotext:
+                return Response(status=status.HTTP_404_NOT_FOUND)
+            return self.search(request, geotext=geotext)
+        return self.search(request, near=near)
+
+    @use_replica()
+    def search(self, request, geotext=None, near=None):
+        """
+        list once the address is geocoded, property_search runs it as well so
+        both serve the same responses
+        """
+        if near:
+            query = filter_near(self.get_queryset().published(), *near)
+        else:
+            query = filter_in_area(self.get_queryset().published(), geotext)
+        query = self.filter_queryset(query)
+        ranked = PROPERTY_SEARCH.order_by_rank(query, request.query_params)
+
+        # Clients polling a search get 304 without the search being run
+        etag, generation = conditional.search_validators(request, geotext)
+        if etag is None:
+            return self.get_search_response(request, ranked, geotext)
+        response = conditional.not_modified(request, etag)
+        if response is None:
+            # The response has to include the change behind the generation
+            with reads_after(generation):
+                response = self.get_search_response(request, ranked, geotext)
+        return conditional.add_validators(response, etag)
+
+    def get_search_response(self, request, query, geotext=None):
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            return self.stream_ndjson(query)
+        if request.accepted_renderer.format == ColumnarRenderer.format:
+            return Response(columnar.to_columns(*self.select_columns(query)))
+        if request.accepted_renderer.format == PackedRenderer.format:
+            return Response(columnar.pack(*self.select_columns(query)))
+
+        generation = None
+        if geotext:
+            data, generation = search_cache.cache.get(request, geotext)
+            if data is not None:
+                return Response(data)
+
+        # Pages cached under a new generation have to include the change
+        with reads_after(generation):
+            page = self.paginate_queryset(PropertyListSerializer.select(query))
+            serializer = PropertyListSerializer(page, many=True)
+            response = self.get_paginated_response(serializer.data)
+        if geotext:
+            if self.paginator.cursor is None:
+                response.data["cordinates"] = geotext
+            search_cache.cache.set(request, geotext, generation, response.data)
+        return response
+
+    def select_columns(self, query):
+        return columnar.select_rows(query, self.paginator.ordering)
+
+    def stream_ndjson(self, query):
+        # Django 3.2 iterates streaming responses in the event loop under ASGI,
+        # where the ORM can't be used
+        if isinstance(self.request._request, ASGIRequest):
+            raise NotAcceptable("NDJSON exports are only served over WSGI.")
+        if not query.ordered:
+            query = query.order_by(*self.paginator.ordering)
+        # Rows are read after the view returned, outside use_replica
+        query = query.using(router.db_for_read(Property))
+        rows = PropertyListSerializer.select(query).iterator(
+            chunk_size=settings.EXPORT_CHUNK_SIZE
+        )
+        serializer = PropertyListSerializer()
+        lines = encode_lines(serializer.to_representation(row) for row in rows)
+        return StreamingHttpResponse(lines, content_type=NDJSONRenderer.media_type)
+
+
+search_view = PropertyViewSet.as_view({"get": "search"})
+
+
+async def property_search(request):
+    """
+    ASGI native variant of PropertyViewSet.list, geocoding doesn't hold
+    a worker thread while the upstream request is in flight
+    """
+    try:
+        near = parse_near(request.GET)
+        geotext = None
+        if near is None:
+            address = request.GET.get("address")
+            if not address:
+                return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+
+            geotext = await geocode_async(address)
+            if not geotext:
+                return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+    except APIException as e:
+        detail = (
+            e.detail if isinstance(e.detail, (list, dict)) else {"detail": e.detail}
+        )
+        return JsonResponse(detail, status=e.status_code, safe=False)
+    return await database_sync_to_async(search_view)(
+        request, geotext=geotext, near=near
+    )
+
+
+@swagger_auto_schema(method="get", manual_parameters=PROPERTY_FILTER_PARAMETERS)
+@api_view(["GET"])
+@use_replica()
+def property_tile(request, z, x, y):
+    """Published properties as a Mapbox Vector Tile, filtered like the list"""
+    if not tiles.is_valid_tile(z, x, y):
+        raise NotFound()
+    tile = tiles.cache.get_or_render(z, x, y, request.query_params)
+    return HttpResponse(tile, content_type=tiles.MEDIA_TYPE)
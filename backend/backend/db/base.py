@@ -0,0 +1,47 @@
+from django.contrib.gis.db.backends.postgis.base import (
+    DatabaseWrapper as PostGISDatabaseWrapper,
+)
+from django.db.backends.postgresql.creation import DatabaseCreation as BaseCreation
+
+from .pool import close_pools, get_pool
+
+
+class DatabaseCreation(BaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Pooled connections would keep the test database open
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(PostGISDatabaseWrapper):
+    """
+    PostGIS backend that takes connections from a process wide pool when
+    settings_dict["POOL"]["SIZE"] is set. Closing the connection, which Django
+    does at the end of every request with CONN_MAX_AGE = 0, returns it.
+    """
+
+    creation_class = DatabaseCreation
+
+    @property
+    def pool_config(self):
+        return self.settings_dict.get("POOL") or {}
+
+    def get_new_connection(self, conn_params):
+        if not self.pool_config.get("SIZE"):
+            return super().get_new_connection(conn_params)
+
+        def connect():
+            return super(DatabaseWrapper, self).get_new_connection(conn_params)
+
+        self.pool = get_pool(conn_params, connect, self.pool_config)
+        connection = self.pool.checkout()
+        self.isolation_level = self.settings_dict["OPTIONS"].get(
+            "isolation_level", connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is None or not self.pool_config.get("SIZE"):
+            return super()._close()
+        with self.wrap_database_errors:
+            self.pool.checkin(self.connection)
@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from backend import metrics
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of at most size psycopg2 connections. Threads wait up to
+    timeout seconds for a free one. Connections idle for longer than
+    check_interval are pinged before reuse and replaced after max_lifetime.
+    """
+
+    def __init__(self, connect, size, max_lifetime, check_interval, timeout):
+        self.connect = connect
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        # (connection, opened, last used), most recently used last
+        self.idle = deque()
+        self.opened = {}
+
+    def checkout(self):
+        start = time.monotonic()
+        if not self.slots.acquire(timeout=self.timeout):
+            metrics.incr("db.pool.timeouts")
+            raise psycopg2.OperationalError(
+                f"No database connection free after {self.timeout}s"
+            )
+        metrics.observe("db.pool.wait", time.monotonic() - start)
+        metrics.incr("db.pool.checkouts")
+        try:
+            while True:
+                with self.lock:
+                    entry = self.idle.pop() if self.idle else None
+                if entry is None:
+                    return self.open()
+                connection, opened, last_used = entry
+                if self.is_usable(connection, opened, last_used):
+                    self.opened[connection] = opened
+                    return connection
+                self.discard(connection)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def checkin(self, connection):
+        try:
+            opened = self.opened.pop(connection, None)
+            if opened is None or connection.closed or self.is_expired(opened):
+                self.discard(connection)
+                return
+            if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            with self.lock:
+                self.idle.append((connection, opened, time.monotonic()))
+        except psycopg2.Error:
+            self.discard(connection)
+        finally:
+            self.slots.release()
+
+    def open(self):
+        connection = self.connect()
+        self.opened[connection] = time.monotonic()
+        metrics.incr("db.pool.opened")
+        return connection
+
+    def discard(self, connection):
+        metrics.incr("db.pool.discarded")
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+    def is_expired(self, opened):
+        return time.monotonic() - opened > self.max_lifetime
+
+    def is_usable(self, connection, opened, last_used):
+        if connection.closed or self.is_expired(opened):
+            return False
+        if time.monotonic() - last_used < self.check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            metrics.incr("db.pool.health_check_failures")
+            return False
+
+    def close(self):
+        """Close idle connections, checked out ones are closed on checkin"""
+        with self.lock:
+            idle, self.idle = self.idle, deque()
+        for connection, _, _ in idle:
+            self.discard(connection)
+        self.max_lifetime = -1
+
+
+_lock = threading.Lock()
+# {(pid, connection params): pool}, forked workers build their own pools
+_pools = {}
+
+
+def get_pool(params, connect, config):
+    key = (os.getpid(), tuple(sorted(params.items())))
+    with _lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(
+                connect,
+                size=config["SIZE"],
+                max_lifetime=config["MAX_LIFETIME"],
+                check_interval=config["CHECK_INTERVAL"],
+                timeout=config["TIMEOUT"],
+            )
+        return _pools[key]
+
+
+def close_pools():
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
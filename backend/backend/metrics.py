@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from redis import RedisError
+
+from helpers import get_redis
+
+METRICS_KEY = "metrics"
+
+_lock = threading.Lock()
+_pending = Counter()
+_last_flush = time.monotonic()
+
+
+def incr(name, amount=1):
+    """Count locally and push to the shared Redis hash every METRICS_FLUSH_INTERVAL"""
+    with _lock:
+        _pending[name] += amount
+        due = time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL
+    if due:
+        flush()
+
+
+def observe(name, value):
+    incr(f"{name}.count")
+    incr(f"{name}.sum", value)
+
+
+def flush():
+    global _pending, _last_flush
+    with _lock:
+        pending, _pending = _pending, Counter()
+        _last_flush = time.monotonic()
+    if not pending:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for name, amount in pending.items():
+            pipe.hincrbyfloat(METRICS_KEY, name, amount)
+        pipe.execute()
+    except RedisError:
+        with _lock:
+            _pending.update(pending)
+
+
+def snapshot():
+    flush()
+    try:
+        stored = get_redis().hgetall(METRICS_KEY)
+    except RedisError:
+        stored = {}
+    values = Counter({key.decode(): float(value) for key, value in stored.items()})
+    with _lock:
+        values.update(_pending)
+
+    derived = {}
+    for name, value in values.items():
+        if name.endswith(".hits"):
+            prefix = name[: -len(".hits")]
+            total = value + values.get(f"{prefix}.misses", 0)
+            derived[f"{prefix}.hit_rate"] = value / total if total else 0.0
+        elif name.endswith(".sum"):
+            prefix = name[: -len(".sum")]
+            if count := values.get(f"{prefix}.count"):
+                derived[f"{prefix}.avg"] = value / count
+    values.update(derived)
+    return {
+        name: int(value) if float(value).is_integer() else value
+        for name, value in sorted(values.items())
+    }
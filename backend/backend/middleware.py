@@ -0,0 +1,63 @@
+from django.contrib.auth import SESSION_KEY
+from django.http import HttpResponse
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .routers import pin_user, request_user
+
+
+def get_user_id(request):
+    """User id from the JWT or the session, without a database query"""
+    authentication = JWTAuthentication()
+    if header := authentication.get_header(request):
+        try:
+            raw_token = authentication.get_raw_token(header)
+            token = raw_token and authentication.get_validated_token(raw_token)
+        except AuthenticationFailed:
+            return None
+        return token.get(api_settings.USER_ID_CLAIM) if token else None
+    return request.session.get(SESSION_KEY)
+
+
+class ReplicaPinningMiddleware:
+    """Pin users to the primary database for a while after they write"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user_id = get_user_id(request)
+        with request_user(user_id):
+            response = self.get_response(request)
+        if (
+            user_id is not None
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+        ):
+            pin_user(user_id)
+        return response
+
+
+class ThrottledMiddleware:
+    """
+    429 with Retry-After for Throttled raised outside DRF views, e.g. by the
+    password pool on the admin login
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, Throttled):
+            return None
+        response = HttpResponse(
+            exception.detail, status=exception.status_code, content_type="text/plain"
+        )
+        if exception.wait is not None:
+            response["Retry-After"] = "%d" % exception.wait
+        return response
@@ -0,0 +1,82 @@
+import time
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+import boto3
+import requests
+from botocore.config import Config
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import metrics
+
+
+def record_latency(url, seconds):
+    metrics.observe(f"outbound.{urlsplit(url).hostname}.latency", seconds)
+
+
+class OutboundSession(requests.Session):
+    """Session with a default timeout that records latency per host"""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        try:
+            return super().request(method, url, *args, **kwargs)
+        except requests.RequestException:
+            metrics.incr(f"outbound.{urlsplit(url).hostname}.errors")
+            raise
+        finally:
+            record_latency(url, time.perf_counter() - start)
+
+
+@lru_cache(maxsize=None)
+def get_session(service):
+    """Process wide keep-alive session for one of OUTBOUND_SERVICES"""
+    config = settings.OUTBOUND_SERVICES[service]
+    retry = Retry(
+        total=config["retries"],
+        backoff_factor=config["backoff"],
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+    )
+    adapter = HTTPAdapter(pool_maxsize=config["pool_size"], max_retries=retry)
+    session = OutboundSession(config["timeout"])
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@lru_cache(maxsize=None)
+def get_boto3_client(service):
+    """Process wide boto3 client, they are thread safe and slow to create"""
+    config = settings.OUTBOUND_SERVICES[service]
+    client = boto3.client(
+        service,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name=settings.AWS_REGION_NAME,
+        config=Config(
+            connect_timeout=config["timeout"],
+            read_timeout=config["timeout"],
+            retries={"max_attempts": config["retries"] + 1, "mode": "standard"},
+            max_pool_connections=config["pool_size"],
+        ),
+    )
+    endpoint = client.meta.endpoint_url
+
+    def start_timer(context, **kwargs):
+        context["outbound_start"] = time.perf_counter()
+
+    def stop_timer(context, **kwargs):
+        if start := context.get("outbound_start"):
+            record_latency(endpoint, time.perf_counter() - start)
+
+    client.meta.events.register("before-call", start_timer)
+    client.meta.events.register("after-call", stop_timer)
+    return client
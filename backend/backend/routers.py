@@ -0,0 +1,148 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from redis import RedisError
+
+from helpers import get_redis
+
+from . import metrics
+
+# Seconds the replica is behind, 0 when it replayed everything it received.
+# NULL when it isn't streaming from the primary, having replayed everything it
+# received then says nothing about the writes it missed.
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT EXISTS (
+            SELECT FROM pg_stat_wal_receiver WHERE status = 'streaming'
+        ) THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+PIN_PREFIX = "replica-pin:"
+
+_replica_reads = ContextVar("replica_reads", default=False)
+_user_id = ContextVar("replica_user_id", default=None)
+_pinned = ContextVar("replica_pinned", default=None)
+
+_lag_lock = threading.Lock()
+# {alias: (checked at, healthy)}
+_lag_checks = {}
+
+
+@contextmanager
+def use_replica():
+    """Send reads to a replica, also usable as a decorator of sync code"""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def reads_after(written_at):
+    """
+    Reads see a write made at written_at, a time.time_ns() or None, inside
+    use_replica they go to default while a replica may not have replayed it
+    """
+    window = settings.REPLICA_MAX_LAG + settings.REPLICA_LAG_CHECK_INTERVAL
+    recent = written_at is not None and time.time_ns() - int(written_at) < window * 1e9
+    token = _replica_reads.set(_replica_reads.get() and not recent)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def request_user(user_id):
+    """Identify the user of the current request for read-your-writes"""
+    user_token = _user_id.set(user_id)
+    pinned_token = _pinned.set(None)
+    try:
+        yield
+    finally:
+        _user_id.reset(user_token)
+        _pinned.reset(pinned_token)
+
+
+def pin_user(user_id):
+    """Read user's queries from default while replicas catch up on a write"""
+    try:
+        get_redis().setex(f"{PIN_PREFIX}{user_id}", settings.REPLICA_PIN_SECONDS, 1)
+    except RedisError:
+        pass
+
+
+def is_pinned():
+    if (pinned := _pinned.get()) is None:
+        user_id = _user_id.get()
+        try:
+            pinned = user_id is not None and bool(
+                get_redis().exists(f"{PIN_PREFIX}{user_id}")
+            )
+        except RedisError:
+            # Unknown, default is always up to date
+            pinned = True
+        _pinned.set(pinned)
+    return pinned
+
+
+def measure_lag(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        return cursor.fetchone()[0]
+
+
+def is_healthy(alias):
+    now = time.monotonic()
+    with _lag_lock:
+        checked, healthy = _lag_checks.get(alias, (None, False))
+        if checked is not None and now - checked < settings.REPLICA_LAG_CHECK_INTERVAL:
+            return healthy
+        # Other threads use the last result until this check finishes
+        _lag_checks[alias] = (now, healthy)
+    try:
+        lag = measure_lag(alias)
+        healthy = lag is not None and lag <= settings.REPLICA_MAX_LAG
+    except DatabaseError:
+        healthy = False
+    with _lag_lock:
+        _lag_checks[alias] = (now, healthy)
+    return healthy
+
+
+class ReplicaRouter:
+    """
+    Reads inside use_replica go to a random replica that isn't lagging, unless
+    the user wrote recently or the default connection is in a transaction.
+    Everything else uses default.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or not settings.DATABASE_REPLICAS:
+            return "default"
+        if connections["default"].in_atomic_block or is_pinned():
+            metrics.incr("db.replica_pinned")
+            return "default"
+        healthy = [alias for alias in settings.DATABASE_REPLICAS if is_healthy(alias)]
+        if not healthy:
+            metrics.incr("db.replica_fallbacks")
+            return "default"
+        metrics.incr("db.replica_reads")
+        return random.choice(healthy)
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
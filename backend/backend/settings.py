@@ -25,6 +25,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.gis",
+    "django.contrib.postgres",
     "storages",
     "drf_yasg",
     "rest_framework",
@@ -42,6 +43,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "backend.middleware.ReplicaPinningMiddleware",
+    "backend.middleware.ThrottledMiddleware",
 ]
 
 ROOT_URLCONF = "backend.urls"
@@ -67,19 +70,73 @@ WSGI_APPLICATION = "backend.wsgi.application"
 DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
 DATABASES = {
     "default": {
-        "ENGINE": os.environ.get(
-            "POSTGRES_ENGINE", "django.contrib.gis.db.backends.postgis"
-        ),
+        "ENGINE": os.environ.get("POSTGRES_ENGINE", "backend.db"),
         "NAME": os.environ["POSTGRES_DB"],
         "USER": os.environ["POSTGRES_USER"],
         "PASSWORD": os.environ["POSTGRES_PASSWORD"],
         "HOST": os.environ["POSTGRES_HOST"],
         "PORT": os.environ["POSTGRES_PORT"],
+        # Keep a connection per thread for this many seconds, leave at 0 when
+        # pooling, connections go back to the pool after every request
+        "CONN_MAX_AGE": int(os.environ.get("POSTGRES_CONN_MAX_AGE", 0)),
+        # backend.db pool per process, off when SIZE is 0. Times are in seconds,
+        # idle connections are pinged after CHECK_INTERVAL and replaced after
+        # MAX_LIFETIME, TIMEOUT is the longest wait for a free connection.
+        "POOL": {
+            "SIZE": int(os.environ.get("POSTGRES_POOL_SIZE", 0)),
+            "MAX_LIFETIME": float(os.environ.get("POSTGRES_POOL_MAX_LIFETIME", 1800)),
+            "CHECK_INTERVAL": float(os.environ.get("POSTGRES_POOL_CHECK_INTERVAL", 30)),
+            "TIMEOUT": float(os.environ.get("POSTGRES_POOL_TIMEOUT", 10)),
+        },
     }
 }
+# Streaming replicas of default as "host:port,host:port", searches read from
+# them, see backend.routers. Tests run against default instead.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(
+    filter(None, os.environ.get("POSTGRES_REPLICAS", "").split(","))
+):
+    host, _, port = replica.strip().partition(":")
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{index}")
+DATABASE_ROUTERS = ["backend.routers.ReplicaRouter"]
+# Replicas further behind than REPLICA_MAX_LAG seconds aren't read from, lag
+# is checked at most every REPLICA_LAG_CHECK_INTERVAL seconds per process.
+# Users read from default for REPLICA_PIN_SECONDS after their own writes.
+REPLICA_MAX_LAG = float(os.environ.get("REPLICA_MAX_LAG", 5))
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get("REPLICA_LAG_CHECK_INTERVAL", 5))
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", 10))
 
 
 AUTHENTICATION_BACKENDS = ["users.backends.AuthBackend"]
+# Threads hashing passwords per process, logins waiting for one beyond the
+# queue size get 429 with Retry-After. Every login in the pool holds a request
+# thread, keep workers + queue size below the threads of a server process
+# (e.g. gunicorn --threads) so the rest keep serving other requests.
+PASSWORD_POOL_WORKERS = int(os.environ.get("PASSWORD_POOL_WORKERS", 2))
+PASSWORD_POOL_QUEUE_SIZE = int(os.environ.get("PASSWORD_POOL_QUEUE_SIZE", 0))
+PASSWORD_POOL_RETRY_AFTER = int(os.environ.get("PASSWORD_POOL_RETRY_AFTER", 2))
+
+# New passwords use the first hasher, hashes of the others and with other
+# costs are rehashed on login. Measure costs on the deployment host with the
+# tune_password_hashers command.
+PASSWORD_HASHERS = [
+    "users.hashers.Argon2PasswordHasher",
+    "users.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+]
+PASSWORD_ARGON2 = {
+    "TIME_COST": int(os.environ.get("PASSWORD_ARGON2_TIME_COST", 2)),
+    # KiB
+    "MEMORY_COST": int(os.environ.get("PASSWORD_ARGON2_MEMORY_COST", 102400)),
+    "PARALLELISM": int(os.environ.get("PASSWORD_ARGON2_PARALLELISM", 8)),
+}
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get("PASSWORD_PBKDF2_ITERATIONS", 260000))
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -102,6 +159,51 @@ USE_TZ = True
 REDIS_HOST = os.environ["REDIS_HOST"]
 REDIS_DATABASE = os.environ["REDIS_DATABASE"]
 REDIS_PORT = os.environ["REDIS_PORT"]
+REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", 0.25))
+
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 10))
+
+NOMINATIM_URL = os.environ.get(
+    "NOMINATIM_URL", "https://nominatim.openstreetmap.org/search"
+)
+GEOCODING_CACHE_TTL = int(os.environ.get("GEOCODING_CACHE_TTL", 60 * 60 * 24 * 7))
+GEOCODING_CACHE_NEGATIVE_TTL = int(
+    os.environ.get("GEOCODING_CACHE_NEGATIVE_TTL", 60 * 60)
+)
+GEOCODING_CACHE_MAXSIZE = int(os.environ.get("GEOCODING_CACHE_MAXSIZE", 1024))
+GEOCODING_TIMEOUT = float(os.environ.get("GEOCODING_TIMEOUT", 5))
+GEOCODING_MAX_CONCURRENCY = int(os.environ.get("GEOCODING_MAX_CONCURRENCY", 50))
+GEOCODING_MAX_CONNECTIONS = int(os.environ.get("GEOCODING_MAX_CONNECTIONS", 20))
+
+GAZETTEER_MIN_SIMILARITY = float(os.environ.get("GAZETTEER_MIN_SIMILARITY", 0.6))
+GAZETTEER_SIMPLIFY_TOLERANCE = float(
+    os.environ.get("GAZETTEER_SIMPLIFY_TOLERANCE", 0.0001)
+)
+
+SEARCH_SUBDIVIDE_MAX_VERTICES = int(
+    os.environ.get("SEARCH_SUBDIVIDE_MAX_VERTICES", 256)
+)
+SEARCH_PAGE_SIZE = int(os.environ.get("SEARCH_PAGE_SIZE", 50))
+SEARCH_MAX_PAGE_SIZE = int(os.environ.get("SEARCH_MAX_PAGE_SIZE", 500))
+SEARCH_MAX_RADIUS = int(os.environ.get("SEARCH_MAX_RADIUS", 50_000))
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 2000))
+COLUMNAR_MAX_ROWS = int(os.environ.get("COLUMNAR_MAX_ROWS", 50_000))
+# Seconds a CDN or proxy may serve searches and properties without asking
+HTTP_CACHE_MAX_AGE = int(os.environ.get("HTTP_CACHE_MAX_AGE", 60))
+SEARCH_CACHE_TTL = int(os.environ.get("SEARCH_CACHE_TTL", 60 * 10))
+# Degrees per side of the grid cells cached search areas are indexed by
+SEARCH_CACHE_GRID_SIZE = float(os.environ.get("SEARCH_CACHE_GRID_SIZE", 0.5))
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 2000))
+IMPORT_REVIEW_BATCH_SIZE = int(os.environ.get("IMPORT_REVIEW_BATCH_SIZE", 100))
+
+MAP_MAX_ZOOM = 22
+# Cells across a 256px tile, 4 means one cluster per 64px
+CLUSTER_CELLS_PER_TILE = int(os.environ.get("CLUSTER_CELLS_PER_TILE", 4))
+CLUSTER_MAX_CELLS = int(os.environ.get("CLUSTER_MAX_CELLS", 10_000))
+# Below TILE_MIN_ZOOM maps use the clusters endpoint instead of tiles
+TILE_MIN_ZOOM = int(os.environ.get("TILE_MIN_ZOOM", 8))
+TILE_MAX_FEATURES = int(os.environ.get("TILE_MAX_FEATURES", 10_000))
+TILE_CACHE_TTL = int(os.environ.get("TILE_CACHE_TTL", 60 * 60))
 
 CELERY_TIMEZONE = "Europe/London"
 CELERY_BROKER_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DATABASE}"
@@ -114,6 +216,15 @@ AWS_REGION_NAME = os.environ.get("AWS_REGION_NAME")
 AWS_S3_OBJECT_PARAMETERS = {"ACL": "public-read", "CacheControl": "max-age=86400"}
 AWS_QUERYSTRING_AUTH = False
 
+# Use api.validators.stub_detect_labels to work without Rekognition. Bump the
+# version when the classifier changes, stored results are keyed by it
+IMAGE_CLASSIFIER = os.environ.get("IMAGE_CLASSIFIER", "api.validators.detect_labels")
+IMAGE_CLASSIFIER_VERSION = os.environ.get("IMAGE_CLASSIFIER_VERSION", "rekognition-1")
+IMAGE_CLASSIFICATION_CACHE_MAXSIZE = int(
+    os.environ.get("IMAGE_CLASSIFICATION_CACHE_MAXSIZE", 4096)
+)
+THUMBNAIL_WIDTHS = (320, 640, 1024)
+
 STATIC_LOCATION = "static"
 STATIC_URL = f"https://{AWS_STORAGE_BUCKET_NAME}.s3.{AWS_REGION_NAME}.amazonaws.com/{STATIC_LOCATION}/"
 STATICFILES_STORAGE = "backend.storage_backends.StaticStorage"
@@ -142,6 +253,18 @@ TOTP_INTERVAL = 120
 
 FACEBOOK_ACCESS_TOKEN = os.environ["FACEBOOK_ACCESS_TOKEN"]
 
+# Timeouts are in seconds, retries with exponential backoff of backoff * 2^n
+OUTBOUND_SERVICES = {
+    "nominatim": {
+        "timeout": GEOCODING_TIMEOUT,
+        "retries": 2,
+        "backoff": 0.2,
+        "pool_size": GEOCODING_MAX_CONNECTIONS,
+    },
+    "facebook": {"timeout": 5, "retries": 2, "backoff": 0.2, "pool_size": 10},
+    "rekognition": {"timeout": 10, "retries": 2, "backoff": 0.5, "pool_size": 10},
+}
+
 AUTH_USER_MODEL = "users.CustomUser"
 
 sentry_sdk.init(
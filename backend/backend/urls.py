@@ -4,9 +4,12 @@ from django.urls import include, path, re_path
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 
+from .views import MetricsView
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/users/", include("users.urls")),
+    path("api/metrics/", MetricsView.as_view(), name="metrics"),
     path("api/", include("api.urls")),
 ]
 
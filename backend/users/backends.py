@@ -1,5 +1,6 @@
 from django.contrib.auth.backends import ModelBackend
 
+from . import passwords
 from .models import CustomUser
 from .utils import get_fb_user_id, log_authentication_data
 
@@ -9,9 +10,15 @@ class AuthBackend(ModelBackend):
         try:
             user = CustomUser.objects.get(email=email)
         except CustomUser.DoesNotExist:
-            CustomUser().set_password(password)
+            # Unknown emails take as long as wrong passwords
+            passwords.hash_password(password)
         else:
-            if user.check_password(password) and self.user_can_authenticate(user):
+            matches, rehashed = passwords.verify_password(password, user.password)
+            # Hashed in the pool, saved on the request's database connection
+            if rehashed:
+                user.password = rehashed
+                user.save(update_fields=["password"])
+            if matches and self.user_can_authenticate(user):
                 if not user.is_2fa_enabled:
                     log_authentication_data(request, user)
                 return user
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """
+    Argon2 with the costs in settings.PASSWORD_ARGON2, pick them with the
+    tune_password_hashers command. Hashes with other costs are upgraded on
+    the next successful login.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2["TIME_COST"]
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2["MEMORY_COST"]
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2["PARALLELISM"]
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2 with settings.PASSWORD_PBKDF2_ITERATIONS"""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
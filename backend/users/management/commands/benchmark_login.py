@@ -0,0 +1,100 @@
+import asyncio
+import statistics
+import time
+from collections import Counter
+
+import httpx
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from users.models import CustomUser
+
+EMAIL = "benchmark-login@example.com"
+PASSWORD = "benchmark-login-password"
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    if not timings:
+        return "no requests"
+    return (
+        f"p50={statistics.median(timings) * 1000:.0f}ms "
+        f"p99={timings[int(len(timings) * 0.99)] * 1000:.0f}ms"
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Run login and property search clients at the same time against a "
+        "running server and report logins/s and search latency, e.g. with "
+        "the stub_geocoder command and NOMINATIM_URL set to the stub"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument("--login-clients", type=int, default=100)
+        parser.add_argument("--search-clients", type=int, default=20)
+        parser.add_argument("--duration", type=float, default=30)
+        parser.add_argument("--address", default="Stubtown")
+
+    def handle(self, *args, **options):
+        user, _ = CustomUser.objects.get_or_create(
+            email=EMAIL, defaults={"username": "benchmark-login"}
+        )
+        user.set_password(PASSWORD)
+        user.save(update_fields=["password"])
+        try:
+            logins, searches = asyncio.run(self.run(**options))
+        finally:
+            user.delete()
+
+        duration = options["duration"]
+        login_statuses = Counter(status for status, _ in logins)
+        self.stdout.write(
+            f"logins {len(logins)} in {duration:.0f}s, "
+            f"{login_statuses[200] / duration:.1f} successful/s, "
+            f"{percentiles([timing for _, timing in logins])}, "
+            f"status codes {dict(login_statuses)}"
+        )
+        search_statuses = Counter(status for status, _ in searches)
+        self.stdout.write(
+            f"searches {len(searches)}, {len(searches) / duration:.1f} req/s, "
+            f"{percentiles([timing for _, timing in searches])}, "
+            f"status codes {dict(search_statuses)}"
+        )
+
+    async def run(self, url, login_clients, search_clients, duration, address, **_):
+        logins, searches = [], []
+        deadline = time.perf_counter() + duration
+        login = {"auth_type": "email", "email": EMAIL, "password": PASSWORD}
+
+        async def client_loop(client, results, request):
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    status = (await request(client)).status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                results.append((status, time.perf_counter() - start))
+
+        def post_login(client):
+            return client.post(url + reverse("token_obtain_pair"), json=login)
+
+        def get_search(client):
+            return client.get(
+                url + reverse("properties-list"), params={"address": address}
+            )
+
+        limits = httpx.Limits(max_connections=login_clients + search_clients)
+        async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+            await asyncio.gather(
+                *(
+                    client_loop(client, logins, post_login)
+                    for _ in range(login_clients)
+                ),
+                *(
+                    client_loop(client, searches, get_search)
+                    for _ in range(search_clients)
+                ),
+            )
+        return logins, searches
@@ -0,0 +1,111 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand, CommandError
+
+PASSWORD = "tune-password-hashers"
+# KiB, 19 MiB is the least OWASP recommends for Argon2id
+MEMORY_COSTS = (19456, 47104, 65536, 102400, 262144, 524288)
+MAX_TIME_COST = 10
+PBKDF2_SAMPLE_ITERATIONS = 100_000
+
+
+def measure(hasher, repeat):
+    """Median seconds to verify a password hashed by hasher"""
+    encoded = hasher.encode(PASSWORD, hasher.salt())
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hasher.verify(PASSWORD, encoded)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def argon2_hasher(time_cost, memory_cost, parallelism):
+    hasher = hashers.Argon2PasswordHasher()
+    hasher.time_cost = time_cost
+    hasher.memory_cost = memory_cost
+    hasher.parallelism = parallelism
+    return hasher
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure password hasher costs on this host and print the settings "
+        "that verify a password in about the target time"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target-ms", type=float, default=250, help="Verify time per login"
+        )
+        parser.add_argument(
+            "--max-memory",
+            type=int,
+            default=102400,
+            help="Argon2 KiB per hash, every password pool worker can use this much",
+        )
+        parser.add_argument(
+            "--parallelism",
+            type=int,
+            default=settings.PASSWORD_ARGON2["PARALLELISM"],
+            help="Argon2 lanes, at most the CPU cores of a worker",
+        )
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        target = options["target_ms"] / 1000
+        repeat = options["repeat"]
+        try:
+            current = measure(hashers.get_hasher(), repeat)
+        except ValueError as e:
+            raise CommandError(e)
+        self.stdout.write(f"current default hasher {current * 1000:.1f}ms")
+
+        argon2 = self.tune_argon2(
+            target, options["max_memory"], options["parallelism"], repeat
+        )
+        if argon2 is None:
+            self.stderr.write(
+                "No Argon2 costs verify within the target, using the least"
+            )
+            argon2 = 1, min(MEMORY_COSTS)
+        iterations = self.tune_pbkdf2(target, repeat)
+
+        self.stdout.write(f"\nSettings for a {options['target_ms']:.0f}ms verify:")
+        self.stdout.write(f"PASSWORD_ARGON2_TIME_COST={argon2[0]}")
+        self.stdout.write(f"PASSWORD_ARGON2_MEMORY_COST={argon2[1]}")
+        self.stdout.write(f"PASSWORD_ARGON2_PARALLELISM={options['parallelism']}")
+        self.stdout.write(f"PASSWORD_PBKDF2_ITERATIONS={iterations}")
+
+    def tune_argon2(self, target, max_memory, parallelism, repeat):
+        """(time cost, memory cost) with the most memory, then the most passes"""
+        memory_costs = [cost for cost in MEMORY_COSTS if cost <= max_memory]
+        for memory_cost in sorted(memory_costs, reverse=True):
+            best = None
+            for time_cost in range(1, MAX_TIME_COST + 1):
+                hasher = argon2_hasher(time_cost, memory_cost, parallelism)
+                seconds = measure(hasher, repeat)
+                self.stdout.write(
+                    f"argon2 t={time_cost} m={memory_cost} p={parallelism} "
+                    f"{seconds * 1000:.1f}ms"
+                )
+                if seconds > target:
+                    break
+                best = time_cost, memory_cost
+            if best is not None:
+                return best
+        return None
+
+    def tune_pbkdf2(self, target, repeat):
+        """Iterations scaled from a sample, PBKDF2 time is linear in them"""
+        hasher = hashers.PBKDF2PasswordHasher()
+        hasher.iterations = PBKDF2_SAMPLE_ITERATIONS
+        seconds = measure(hasher, repeat)
+        self.stdout.write(
+            f"pbkdf2_sha256 iterations={hasher.iterations} {seconds * 1000:.1f}ms"
+        )
+        iterations = int(hasher.iterations * target / seconds)
+        return max(iterations // 10_000 * 10_000, 10_000)
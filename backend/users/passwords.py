@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework.exceptions import Throttled
+
+from backend import metrics
+
+_lock = threading.Lock()
+# {pid: PasswordPool}, threads don't survive a fork
+_pools = {}
+
+
+class PasswordPool:
+    """
+    Password hashing on at most workers threads instead of the request
+    threads. Up to queue_size more hashes wait for a thread, requests past
+    that are shed with 429 so logins can't take every server worker. The
+    request thread waits for the hash, so workers + queue_size is the number
+    of request threads logins may hold.
+    """
+
+    def __init__(self, workers, queue_size, retry_after):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="password")
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.retry_after = retry_after
+
+    def run(self, function, *args):
+        if not self.slots.acquire(blocking=False):
+            metrics.incr("auth.password_pool.rejected")
+            raise Throttled(wait=self.retry_after)
+        queued = time.perf_counter()
+
+        def task():
+            metrics.observe("auth.password_pool.wait", time.perf_counter() - queued)
+            try:
+                return function(*args)
+            finally:
+                # Before the result is set, so the caller's next run has a slot
+                self.slots.release()
+
+        try:
+            future = self.executor.submit(task)
+        except BaseException:
+            self.slots.release()
+            raise
+        return future.result()
+
+
+def get_pool():
+    with _lock:
+        pid = os.getpid()
+        if pid not in _pools:
+            _pools[pid] = PasswordPool(
+                settings.PASSWORD_POOL_WORKERS,
+                settings.PASSWORD_POOL_QUEUE_SIZE,
+                settings.PASSWORD_POOL_RETRY_AFTER,
+            )
+        return _pools[pid]
+
+
+def _verify(password, encoded):
+    rehashed = []
+    matches = check_password(
+        password, encoded, setter=lambda raw: rehashed.append(make_password(raw))
+    )
+    return matches, rehashed[0] if rehashed else None
+
+
+def verify_password(password, encoded):
+    """
+    (password matches encoded, new hash when encoded uses an outdated hasher
+    or None), hashed in the pool
+    """
+    return get_pool().run(_verify, password, encoded)
+
+
+def hash_password(password):
+    return get_pool().run(make_password, password)
@@ -3,6 +3,13 @@ import pytest
 from users.models import CustomUser
 
 
+@pytest.fixture
+def fast_argon2(settings):
+    """Cheapest Argon2 costs, hashing with the defaults is slow on purpose"""
+    settings.PASSWORD_ARGON2 = {"TIME_COST": 1, "MEMORY_COST": 64, "PARALLELISM": 1}
+    return settings.PASSWORD_ARGON2
+
+
 @pytest.fixture
 def registration_data():
     return {
@@ -0,0 +1,48 @@
+import pytest
+from django.contrib.auth.hashers import check_password, get_hasher, make_password
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+
+@pytest.mark.usefixtures("fast_argon2")
+class TestHashers:
+    def test_argon2_uses_settings(self):
+        encoded = make_password("password")
+        assert encoded.startswith("argon2$argon2id$v=19$m=64,t=1,p=1$")
+        assert check_password("password", encoded)
+        assert not get_hasher().must_update(encoded)
+
+    def test_changed_costs_need_update(self, fast_argon2):
+        encoded = make_password("password")
+        with override_settings(PASSWORD_ARGON2={**fast_argon2, "TIME_COST": 2}):
+            assert get_hasher().must_update(encoded)
+
+    def test_pbkdf2_uses_settings(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            encoded = make_password("password", hasher="pbkdf2_sha256")
+            assert encoded.startswith("pbkdf2_sha256$1000$")
+            assert not get_hasher("pbkdf2_sha256").must_update(encoded)
+
+    @pytest.mark.django_db
+    def test_login_upgrades_hash(self, user, registration_data):
+        user.password = make_password(
+            registration_data["password"], hasher="pbkdf2_sha1"
+        )
+        user.save()
+        client = APIClient()
+        client.credentials(HTTP_USER_AGENT="Linux")
+        response = client.post(
+            reverse("token_obtain_pair"), registration_data, format="json"
+        )
+        assert response.status_code == 200
+        user.refresh_from_db()
+        assert user.password.startswith("argon2$argon2id$v=19$m=64,t=1,p=1$")
+
+
+def test_tune_password_hashers(capsys):
+    call_command("tune_password_hashers", target_ms=1000, max_memory=19456, repeat=1)
+    out = capsys.readouterr().out
+    assert "PASSWORD_ARGON2_MEMORY_COST=19456" in out
+    assert "PASSWORD_PBKDF2_ITERATIONS=" in out
@@ -0,0 +1,81 @@
+import threading
+from unittest import mock
+
+import pytest
+from django.contrib.auth.hashers import check_password, get_hasher, make_password
+from django.urls import reverse
+from rest_framework.exceptions import Throttled
+from rest_framework.test import APIClient
+
+from users.passwords import PasswordPool, verify_password
+
+pytestmark = pytest.mark.usefixtures("fast_argon2")
+
+
+class TestPasswordPool:
+    def test_run(self):
+        pool = PasswordPool(workers=1, queue_size=0, retry_after=3)
+        encoded = pool.run(make_password, "password")
+        assert encoded.startswith(f"{get_hasher().algorithm}$")
+        # The slot is free again
+        assert pool.run(lambda: threading.current_thread().name).startswith("password")
+
+    def test_full_pool_sheds_load(self):
+        pool = PasswordPool(workers=1, queue_size=0, retry_after=3)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        thread = threading.Thread(target=pool.run, args=[block])
+        thread.start()
+        started.wait(5)
+        try:
+            with pytest.raises(Throttled) as e:
+                pool.run(make_password, "password")
+            assert e.value.wait == 3
+        finally:
+            release.set()
+            thread.join()
+
+
+def test_verify_password():
+    encoded = make_password("password")
+    assert verify_password("password", encoded) == (True, None)
+    assert verify_password("wrong", encoded) == (False, None)
+
+
+def test_verify_password_rehashes_outdated_hash():
+    matches, rehashed = verify_password(
+        "password", make_password("password", hasher="pbkdf2_sha1")
+    )
+    assert matches
+    assert rehashed.startswith(f"{get_hasher().algorithm}$")
+    assert check_password("password", rehashed)
+
+
+@pytest.mark.django_db
+def test_login_is_shed_when_pool_is_full(user, registration_data):
+    client = APIClient()
+    client.credentials(HTTP_USER_AGENT="Linux")
+    with mock.patch.object(PasswordPool, "run", side_effect=Throttled(wait=2)):
+        response = client.post(
+            reverse("token_obtain_pair"), registration_data, format="json"
+        )
+    assert response.status_code == 429
+    assert response["Retry-After"] == "2"
+
+
+@pytest.mark.django_db
+def test_admin_login_is_shed_when_pool_is_full(client, user, registration_data):
+    with mock.patch.object(PasswordPool, "run", side_effect=Throttled(wait=2)):
+        response = client.post(
+            reverse("admin:login"),
+            {
+                "username": registration_data["email"],
+                "password": registration_data["password"],
+            },
+        )
+    assert response.status_code == 429
+    assert response["Retry-After"] == "2"
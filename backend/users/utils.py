@@ -1,13 +1,16 @@
-import requests
 from django.conf import settings
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from rest_framework.exceptions import ParseError
 from user_agents import parse
 
+from backend.outbound import get_session
+
 from .models import AuthenticationData
 
 Token = PasswordResetTokenGenerator()
 
+FACEBOOK_DEBUG_TOKEN_URL = "https://graph.facebook.com/debug_token"
+
 
 def log_authentication_data(request, user):
     data = parse(request.META["HTTP_USER_AGENT"])
@@ -21,9 +24,8 @@ def log_authentication_data(request, user):
 
 
 def get_fb_user_id(token):
-    r = requests.get(
-        f"https://graph.facebook.com/debug_token?input_token={token}&access_token={settings.FACEBOOK_ACCESS_TOKEN}"
-    ).json()
+    params = {"input_token": token, "access_token": settings.FACEBOOK_ACCESS_TOKEN}
+    r = get_session("facebook").get(FACEBOOK_DEBUG_TOKEN_URL, params=params).json()
     data = r.get("data")
 
     if (error := r.get("error")) or data.get("error"):
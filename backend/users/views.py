@@ -11,6 +11,8 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 
+from backend.routers import use_replica
+
 from .models import CustomUser
 from .serializers import (
     EmailRegisterUserSerializer,
@@ -203,6 +205,9 @@ class CustomTokenObtainPairViewSchema(SwaggerAutoSchema):
                     type=openapi.TYPE_OBJECT,
                 ),
             ),
+            "429": openapi.Response(
+                "Too many logins in progress, retry after the Retry-After seconds"
+            ),
         }
 
 
@@ -247,6 +252,7 @@ class EmailLookupViewSchema(SwaggerAutoSchema):
 
 class EmailLookupView(APIView):
     @swagger_auto_schema(auto_schema=EmailLookupViewSchema)
+    @use_replica()
     def get(self, request):
         email = request.query_params.get("email")
         if email:
@@ -377,6 +383,9 @@ class TwoFATokenObtainPairViewSchema(SwaggerAutoSchema):
                     type=openapi.TYPE_OBJECT,
                 ),
             ),
+            "429": openapi.Response(
+                "Too many logins in progress, retry after the Retry-After seconds"
+            ),
         }
 
 